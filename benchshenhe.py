@@ -0,0 +1,359 @@
+"""插件性能基准测试
+
+使用模拟的 aiocqhttp 机器人和本地 HTTP 接口替身驱动 GroupInformationPlugin，测量：
+  - 加群请求突发时的卡密验证延迟（p50 / p99）
+  - 导出所有群数据的耗时与峰值内存
+  - 批量推送群成员的吞吐量
+
+需在已安装 AstrBot 的环境中运行，结果以 JSON 输出，便于跟踪性能回归：
+    python benchshenhe.py --groups 200 --members 500 --output bench_output.txt
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import mainshenhe  # noqa: E402
+from astrbot.core.platform.message_type import MessageType  # noqa: E402
+
+ADMIN_QQ = "1537008949"
+
+
+class FakeBot:
+    """模拟的 aiocqhttp 客户端：可配置群数、每群人数、调用延迟及 next_token 分页"""
+
+    def __init__(self, groups: int, members: int, latency: float, page_size: int, overlap: float):
+        self.self_id = 10000
+        self.groups = groups
+        self.members = members
+        self.latency = latency
+        self.page_size = page_size
+        # 用户池小于成员总数时，同一用户会出现在多个群中
+        self.population = max(int(groups * members / max(overlap, 1.0)), members)
+        self.calls = 0
+        self.decisions: Dict[str, float] = {}
+        self.uploads: List[Dict[str, Any]] = []
+
+    async def _delay(self) -> None:
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def get_group_list(self, **kwargs) -> List[Dict[str, Any]]:
+        await self._delay()
+        return [
+            {"group_id": 100000 + g, "group_name": f"测试群{g}", "member_count": self.members}
+            for g in range(self.groups)
+        ]
+
+    def _member(self, group_id: int, idx: int) -> Dict[str, Any]:
+        user_id = 200000000 + (group_id * 7919 + idx * 104729) % self.population
+        return {
+            "group_id": group_id, "user_id": user_id, "nickname": f"用户{user_id}", "card": f"名片{idx}",
+            "sex": "unknown", "age": 0, "area": "", "level": "1", "role": "member", "title": "",
+            "join_time": 1700000000 + idx, "last_sent_time": 1710000000 + idx,
+            "title_expire_time": 0, "shut_up_timestamp": 0, "unfriendly": False, "card_changeable": True
+        }
+
+    async def get_group_member_list(self, group_id: int, next_token: Optional[str] = None, **kwargs) -> Any:
+        await self._delay()
+        start = int(next_token or 0)
+        end = self.members if not self.page_size else min(start + self.page_size, self.members)
+        page = [self._member(group_id, idx) for idx in range(start, end)]
+        if not self.page_size:
+            return page
+        return {"data": page, "next_token": str(end) if end < self.members else None}
+
+    async def set_group_add_request(self, flag: str, **kwargs) -> None:
+        await self._delay()
+        self.decisions[flag] = time.perf_counter()
+
+    async def upload_group_file(self, **kwargs) -> None:
+        await self._delay()
+        self.uploads.append(kwargs)
+
+    async def upload_private_file(self, **kwargs) -> None:
+        await self._delay()
+        self.uploads.append(kwargs)
+
+
+class FakeContext:
+    def __init__(self, bot: FakeBot):
+        self.bot = bot
+
+
+class FakeMessage:
+    type = MessageType.GROUP_MESSAGE
+
+
+class FakeMessageEvent:
+    """模拟管理员在群内发送的命令消息"""
+
+    def __init__(self, bot: FakeBot, text: str):
+        self.bot = bot
+        self.message_obj = FakeMessage()
+        self.text = text
+        self.sent: List[str] = []
+        self.finished = asyncio.Event()
+
+    def plain_result(self, text: str) -> str:
+        return text
+
+    def get_plaintext(self) -> str:
+        return self.text
+
+    def get_sender_id(self) -> str:
+        return ADMIN_QQ
+
+    def get_group_id(self) -> str:
+        return "100000"
+
+    async def send(self, result: str) -> None:
+        self.sent.append(result)
+        if "已完成" in result or "失败" in result.split("\n")[0]:
+            self.finished.set()
+
+
+class FakeRequestEvent:
+    """模拟加群请求事件"""
+
+    def __init__(self, bot: FakeBot, group_id: int, user_id: int, comment: str, flag: str):
+        self.bot = bot
+        self.event_data = {
+            "post_type": "request", "request_type": "group", "sub_type": "add", "self_id": bot.self_id,
+            "group_id": group_id, "user_id": user_id, "comment": comment, "flag": flag
+        }
+
+
+class FakeApi:
+    """本地业务API替身，记录各接口的调用次数与收到的成员数"""
+
+    def __init__(self, latency: float, legacy: bool):
+        self.latency = latency
+        self.legacy = legacy
+        self.requests: Dict[str, int] = {}
+        self.members_received = 0
+        self.bytes_received = 0
+
+    async def _hit(self, request: web.Request) -> bytes:
+        name = request.path.rsplit("/", 1)[-1]
+        self.requests[name] = self.requests.get(name, 0) + 1
+        body = await request.read()
+        self.bytes_received += request.content_length or len(body)
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return body
+
+    @staticmethod
+    def _verdict(key: str) -> Dict[str, Any]:
+        usable = 1 if key.startswith("OK") else 0
+        return {"status": "success", "usable": usable, "message": "" if usable else "卡密无效"}
+
+    async def check_key(self, request: web.Request) -> web.Response:
+        await self._hit(request)
+        return web.json_response(self._verdict(request.query.get("key", "")))
+
+    async def check_keys(self, request: web.Request) -> web.Response:
+        items = json.loads(await self._hit(request))["items"]
+        return web.json_response({"status": "success", "results": [self._verdict(i["key"]) for i in items]})
+
+    async def mark(self, request: web.Request) -> web.Response:
+        await self._hit(request)
+        return web.json_response({"status": "success"})
+
+    async def push(self, request: web.Request) -> web.Response:
+        payload = json.loads(await self._hit(request))
+        self.members_received += len(payload.get("members", []))
+        return web.json_response({"status": "success"})
+
+    async def push_batch(self, request: web.Request) -> web.Response:
+        groups = json.loads(await self._hit(request))["groups"]
+        self.members_received += sum(len(group.get("members", [])) for group in groups)
+        return web.json_response({"status": "success", "results": [{"status": "success"}] * len(groups)})
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_get("/api/check_key.php", self.check_key)
+        app.router.add_get("/api/mark_key.php", self.mark)
+        app.router.add_post("/api/push_group_members.php", self.push)
+        if not self.legacy:
+            app.router.add_post("/api/check_keys.php", self.check_keys)
+            app.router.add_post("/api/mark_keys.php", self.mark)
+            app.router.add_post("/api/push_group_members_batch.php", self.push_batch)
+            app.router.add_post("/api/push_group_members_delta.php", self.push)
+        return app
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    idx = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[idx]
+
+
+async def bench_join(plugin, bot: FakeBot, api: FakeApi, bursts: int, size: int) -> Dict[str, Any]:
+    """多轮突发加群请求，每轮卡密互不相同，避免命中验证缓存"""
+    latencies = []
+    api_calls = sum(api.requests.values())
+    started = time.perf_counter()
+    for burst in range(bursts):
+        starts = {}
+        events = []
+        for idx in range(size):
+            flag = f"join-{burst}-{idx}"
+            key = f"{'OK' if idx % 4 else 'NO'}{burst:02d}{idx:08d}"
+            starts[flag] = time.perf_counter()
+            events.append(FakeRequestEvent(bot, 100000 + idx % bot.groups, 300000000 + idx, f"卡密 {key}", flag))
+        await asyncio.gather(*(plugin.handle_join_group_request(event) for event in events))
+        latencies.extend((bot.decisions[flag] - start) * 1000 for flag, start in starts.items())
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "burst_size": size,
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "max_ms": round(max(latencies), 3),
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "api_calls": sum(api.requests.values()) - api_calls
+    }
+
+
+async def run_job_command(plugin, bot: FakeBot, handler: str, text: str) -> tuple:
+    """执行会创建后台任务的命令，等待任务完成，返回 (耗时, 完成消息)"""
+    event = FakeMessageEvent(bot, text)
+    started = time.perf_counter()
+    async for _ in getattr(plugin, handler)(event):
+        pass
+    await event.finished.wait()
+    return time.perf_counter() - started, event.sent[-1]
+
+
+async def bench_export(plugin, bot: FakeBot, fmt: str) -> Dict[str, Any]:
+    """导出耗时与峰值内存分两次运行测量，避免 tracemalloc 的开销计入耗时"""
+    command = f"导出所有群数据 {fmt} 刷新"
+    plugin._member_cache = mainshenhe.TTLCache(plugin.MEMBER_CACHE_SIZE)
+    elapsed, message = await run_job_command(plugin, bot, "export_all_groups_data", command)
+    upload = bot.uploads[-1] if bot.uploads else {}
+
+    plugin._member_cache = mainshenhe.TTLCache(plugin.MEMBER_CACHE_SIZE)
+    tracemalloc.start()
+    try:
+        await run_job_command(plugin, bot, "export_all_groups_data", command)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "format": fmt,
+        "seconds": round(elapsed, 3),
+        "members": bot.groups * bot.members,
+        "members_per_s": round(bot.groups * bot.members / elapsed, 1),
+        "peak_traced_mb": round(peak / 1024 / 1024, 2),
+        "file_name": upload.get("name", ""),
+        "ok": "已完成" in message
+    }
+
+
+async def bench_push(plugin, bot: FakeBot, api: FakeApi) -> Dict[str, Any]:
+    plugin._member_cache = mainshenhe.TTLCache(plugin.MEMBER_CACHE_SIZE)
+    received, sent_bytes = api.members_received, api.bytes_received
+    requests = sum(api.requests.values())
+    elapsed, message = await run_job_command(plugin, bot, "get_all_group_members", "获取所有群成员 全量 刷新")
+    members = api.members_received - received
+    return {
+        "seconds": round(elapsed, 3),
+        "members": members,
+        "members_per_s": round(members / elapsed, 1),
+        "groups_per_s": round(bot.groups / elapsed, 2),
+        "api_requests": sum(api.requests.values()) - requests,
+        "bytes_sent": api.bytes_received - sent_bytes,
+        "ok": "已完成" in message
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    api = FakeApi(args.api_latency / 1000, args.legacy_api)
+    runner = web.AppRunner(api.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    bot = FakeBot(args.groups, args.members, args.bot_latency / 1000, args.page_size, args.overlap)
+    plugin = mainshenhe.GroupInformationPlugin(FakeContext(bot))
+    plugin.API_BASE_URL = f"http://127.0.0.1:{port}/api/"
+    plugin.SYNC_SCHEDULE = False
+    if plugin._sync_scheduler:
+        plugin._sync_scheduler.cancel()
+    if args.unthrottled:
+        plugin._onebot_limiter = mainshenhe.TokenBucket(1e9, 10 ** 9)
+        plugin._api_limiter = mainshenhe.TokenBucket(1e9, 10 ** 9)
+
+    results: Dict[str, Any] = {}
+    try:
+        if "join" in args.only:
+            results["join"] = await bench_join(plugin, bot, api, args.bursts, args.burst_size)
+        if "export" in args.only:
+            results["export"] = [await bench_export(plugin, bot, fmt) for fmt in args.formats]
+        if "push" in args.only:
+            results["push"] = await bench_push(plugin, bot, api)
+    finally:
+        await plugin.terminate()
+        await runner.cleanup()
+    results["api_requests"] = api.requests
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="astrbot_plugin_shenhe 性能基准测试")
+    parser.add_argument("--groups", type=int, default=100, help="群数")
+    parser.add_argument("--members", type=int, default=500, help="每群成员数")
+    parser.add_argument("--page-size", type=int, default=0, help="成员列表分页大小，0 为不分页")
+    parser.add_argument("--overlap", type=float, default=3.0, help="平均每个用户所在的群数")
+    parser.add_argument("--bot-latency", type=float, default=5.0, help="OneBot 调用延迟(毫秒)")
+    parser.add_argument("--api-latency", type=float, default=10.0, help="业务API响应延迟(毫秒)")
+    parser.add_argument("--bursts", type=int, default=3, help="加群请求突发轮数")
+    parser.add_argument("--burst-size", type=int, default=200, help="每轮突发的加群请求数")
+    parser.add_argument("--formats", nargs="+", default=["xlsx", "csv.gz"], help="导出格式")
+    parser.add_argument("--only", nargs="+", default=["join", "export", "push"], choices=["join", "export", "push"])
+    parser.add_argument("--legacy-api", action="store_true", help="只提供单条接口，测试降级路径")
+    parser.add_argument("--unthrottled", action="store_true", help="关闭 OneBot/API 限流，只测量插件自身开销")
+    parser.add_argument("--output", help="结果JSON写入的文件，默认只输出到标准输出")
+    args = parser.parse_args()
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="shenhe_bench_") as workdir:
+        # 插件的本地数据库写入临时目录，不影响真实数据
+        os.chdir(workdir)
+        try:
+            results = asyncio.run(run(args))
+        finally:
+            os.chdir(cwd)
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "params": {k: v for k, v in vars(args).items() if k != "output"},
+        "results": results,
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
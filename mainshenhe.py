@@ -1,13 +1,28 @@
 from typing import Any, Dict, List, Optional
-import pandas as pd
 from datetime import datetime
-from io import BytesIO
+from collections import OrderedDict, deque
+import asyncio
 import base64
+import bisect
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+import os
+import secrets
+import shutil
+import sqlite3
+import tempfile
 import time
 import re
-import requests
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+import uuid
+import zipfile
+from pathlib import Path
+import aiohttp
+from aiohttp import web
+import openpyxl
 from astrbot.api.star import Star, register, Context
 from astrbot.api.event.filter import PermissionType, filter
 from astrbot.core.platform.message_type import MessageType
@@ -18,6 +33,961 @@ from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_message_event import (
 from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_request_event import (
     AiocqhttpRequestEvent,
 )
+from astrbot.core.platform.sources.aiocqhttp.aiocqhttp_notice_event import (
+    AiocqhttpNoticeEvent,
+)
+
+
+class TTLCache:
+    """带过期时间的LRU缓存，超出容量时淘汰最久未使用的条目"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Any, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Any, value: Any, ttl: float) -> None:
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Any, default: Any = None) -> Any:
+        entry = self._data.pop(key, None)
+        return default if entry is None else entry[0]
+
+    def __contains__(self, key: Any) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+_MISSING = object()
+
+# Excel不支持的控制字符(ord < 32)
+_EXCEL_INVALID_CHARS = re.compile("[\x00-\x1f]+")
+
+# 整列清理文本时使用的分隔符（Unicode非字符，正常文本中不会出现）
+_COLUMN_SEPARATOR = "\uffff"
+
+# 超过该值(公元10000年)的时间戳交由 datetime 处理，保持原有的异常与回退行为
+_MAX_FAST_TIMESTAMP = 253402300800
+
+# 成员数据中需要清理字符与格式化时间的字段
+_CHAR_CLEAN_FIELDS = ("nickname", "card", "title")
+_TIMESTAMP_FIELDS = ("join_time", "last_sent_time", "title_expire_time", "shut_up_timestamp")
+
+# 规范化导出中归入用户表的资料字段，其余字段归入群成员关系表
+_USER_PROFILE_FIELDS = ("user_id", "nickname", "sex", "age", "area", "qq_level")
+
+# 后台任务类型与状态的显示名称
+_JOB_KIND_NAMES = {"export": "导出所有群数据", "sync": "同步所有群成员"}
+_JOB_STATUS_NAMES = {
+    "queued": "排队中", "running": "进行中", "done": "已完成",
+    "failed": "失败", "cancelled": "已取消", "interrupted": "已中断"
+}
+
+
+class _NullTimer:
+    """指标关闭时使用的空计时器"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def mark(self, status: str) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class _Timer:
+    def __init__(self, metrics: "Metrics", name: str, labels: tuple, counter: Optional[str]):
+        self._metrics = metrics
+        self._name = name
+        self._labels = labels
+        self._counter = counter
+        self._status: Optional[str] = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._metrics.observe_labels(self._name, self._labels, time.perf_counter() - self._started)
+        if self._counter:
+            status = self._status or ("ok" if exc_type is None else "error")
+            self._metrics.inc_labels(self._counter, self._labels + (("status", status),))
+        return False
+
+    def mark(self, status: str) -> None:
+        """指定本次调用的计数状态，用于未抛出异常但不算成功的调用（如被重试的响应）"""
+        self._status = status
+
+
+class Metrics:
+    """计数器与耗时直方图，支持输出 Prometheus 文本格式；关闭时各方法直接返回"""
+
+    BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._counters: Dict[tuple, float] = {}
+        # 直方图：(名称, 标签) -> [各桶计数..., +Inf计数, 总和, 最大值]
+        self._histograms: Dict[tuple, List[float]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: str) -> None:
+        if self.enabled:
+            self.inc_labels(name, tuple(sorted(labels.items())), value)
+
+    def inc_labels(self, name: str, labels: tuple, value: float = 1) -> None:
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: str) -> None:
+        if self.enabled:
+            self.observe_labels(name, tuple(sorted(labels.items())), seconds)
+
+    def observe_labels(self, name: str, labels: tuple, seconds: float) -> None:
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = [0] * (len(self.BUCKETS) + 1) + [0.0, 0.0]
+        histogram[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        histogram[-2] += seconds
+        histogram[-1] = max(histogram[-1], seconds)
+
+    def timer(self, name: str, counter: Optional[str] = None, **labels: str):
+        """计时上下文：记录耗时，指定 counter 时同时按成功/失败计数"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, tuple(sorted(labels.items())), counter)
+
+    def counters(self, name: str) -> Dict[tuple, float]:
+        return {labels: value for (counter, labels), value in self._counters.items() if counter == name}
+
+    def histograms(self, name: str) -> Dict[tuple, List[float]]:
+        return {labels: h for (histogram, labels), h in self._histograms.items() if histogram == name}
+
+    def quantile(self, histogram: List[float], q: float) -> float:
+        """按桶估算分位数，返回所在桶的上界（最后一桶为观测最大值）"""
+        count = sum(histogram[:-2])
+        if not count:
+            return 0.0
+        rank, seen = q * count, 0
+        for idx, bucket_count in enumerate(histogram[:-2]):
+            seen += bucket_count
+            if seen >= rank:
+                return min(self.BUCKETS[idx], histogram[-1]) if idx < len(self.BUCKETS) else histogram[-1]
+        return histogram[-1]
+
+    @staticmethod
+    def _format_labels(labels: tuple) -> str:
+        if not labels:
+            return ""
+        escape = str.maketrans({"\\": "\\\\", '"': '\\"', "\n": "\\n"})
+        pairs = ",".join(f'{k}="{str(v).translate(escape)}"' for k, v in labels)
+        return "{" + pairs + "}"
+
+    def render_prometheus(self, gauges: Optional[Dict[str, float]] = None) -> str:
+        """输出 Prometheus 文本格式"""
+        lines = []
+        for name in sorted({name for name, _ in self._counters}):
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(self.counters(name).items()):
+                lines.append(f"{name}{self._format_labels(labels)} {value:g}")
+        for name in sorted({name for name, _ in self._histograms}):
+            lines.append(f"# TYPE {name} histogram")
+            for labels, histogram in sorted(self.histograms(name).items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.BUCKETS + (float("inf"),), histogram[:-2]):
+                    cumulative += bucket_count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{name}_bucket{self._format_labels(labels + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{self._format_labels(labels)} {histogram[-2]:.6f}")
+                lines.append(f"{name}_count{self._format_labels(labels)} {cumulative}")
+        for name, value in sorted((gauges or {}).items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+class CircuitOpenError(Exception):
+    """熔断器处于打开状态，请求被直接拒绝"""
+
+
+class CircuitBreaker:
+    """按最近请求失败率熔断，熔断一段时间后放行单个探测请求"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_rate: float, window: int, min_calls: int, open_time: float):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_time = open_time
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self.transitions: Dict[str, int] = {}
+        self._outcomes: deque = deque(maxlen=window)
+        self._probe_in_flight = False
+
+    def probe_ready(self) -> bool:
+        """当前是否允许发出请求（不占用探测名额）"""
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.open_time
+        return not self._probe_in_flight
+
+    def allow_request(self) -> bool:
+        if not self.probe_ready():
+            return False
+        if self.state == self.OPEN:
+            self._transition(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            self._probe_in_flight = True
+        return True
+
+    def release_probe(self) -> None:
+        self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._transition(self.CLOSED)
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        if self.state == self.HALF_OPEN:
+            self._transition(self.OPEN)
+            return
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if (self.state == self.CLOSED and len(self._outcomes) >= self.min_calls
+                and failures / len(self._outcomes) >= self.failure_rate):
+            self._transition(self.OPEN)
+
+    def _transition(self, state: str) -> None:
+        transition = f"{self.state}->{state}"
+        self.transitions[transition] = self.transitions.get(transition, 0) + 1
+        logger.warning(f"熔断器[{self.name}] 状态变更: {transition}")
+        self.state = state
+        self._probe_in_flight = False
+        if state == self.OPEN:
+            self.opened_at = time.monotonic()
+        elif state == self.CLOSED:
+            self._outcomes.clear()
+
+
+class TokenBucket:
+    """异步令牌桶限流器，被限流(429)时临时降速，之后逐步恢复到设定速率"""
+
+    def __init__(self, rate: float, burst: int, min_rate_ratio: float = 0.1, recovery_per_second: float = 0.05):
+        self.base_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = rate * min_rate_ratio
+        self.recovery = rate * recovery_per_second
+        self.throttled = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rate < self.base_rate:
+            self.rate = min(self.base_rate, self.rate + self.recovery * elapsed)
+        self._tokens = min(self.burst, self._tokens + elapsed * self.rate)
+
+    async def acquire(self) -> None:
+        """获取一个令牌，不足时异步等待"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                wait = self._paused_until - now
+                if wait <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep(max(wait, (1 - self._tokens) / self.rate))
+
+    def penalize(self, retry_after: Optional[float] = None) -> None:
+        """收到限流响应：速率减半，并在Retry-After期间暂停发放令牌"""
+        self.throttled += 1
+        self.rate = max(self.min_rate, self.rate / 2)
+        self._tokens = min(self._tokens, 0.0)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+
+
+class BotAccountPool:
+    """已连接的QQ账号：各账号独立限流，按群分配负责账号，账号异常时切换到同在群内的其他账号"""
+
+    def __init__(self, rate: float, burst: int, cooldown: float):
+        self._rate = rate
+        self._burst = burst
+        self.cooldown = cooldown
+        self._accounts: Dict[str, Dict[str, Any]] = {}
+        self._group_accounts: Dict[str, List[str]] = {}
+
+    def register(self, bot, self_id: Any) -> None:
+        # 只接受真实的QQ号；aiocqhttp 客户端对不存在的属性返回 functools.partial，通配连接的键为 "*"
+        if not isinstance(self_id, (int, str)) or not str(self_id).isdigit():
+            return
+        self_id = str(self_id)
+        account = self._accounts.get(self_id)
+        if account is None:
+            self._accounts[self_id] = {
+                "bot": bot, "limiter": TokenBucket(self._rate, self._burst), "cooldown_until": 0.0, "failures": 0
+            }
+        else:
+            account["bot"] = bot
+
+    @staticmethod
+    def _wsr_clients(bot) -> Dict[str, Any]:
+        """aiocqhttp 的反向WebSocket连接表，键为账号QQ号，非反向WebSocket模式下为空"""
+        clients = getattr(bot, "_wsr_api_clients", None)
+        return clients if isinstance(clients, dict) else {}
+
+    def discover(self, bot) -> None:
+        """登记客户端上已连接的全部账号，反向WebSocket模式下一个客户端可同时连接多个账号"""
+        for self_id in list(self._wsr_clients(bot)):
+            self.register(bot, self_id)
+
+    def _connected(self, self_id: str, account: Dict[str, Any]) -> bool:
+        # 没有连接信息（HTTP或正向WebSocket模式）时无法判断，视为在线
+        clients = self._wsr_clients(account["bot"])
+        return not clients or self_id in clients
+
+    def available(self) -> List[str]:
+        """未处于冷却期且仍在线的账号"""
+        now = time.monotonic()
+        return [
+            self_id for self_id, account in self._accounts.items()
+            if account["cooldown_until"] <= now and self._connected(self_id, account)
+        ]
+
+    def update_groups(self, mapping: Dict[str, List[str]]) -> None:
+        """更新各群所在的账号列表"""
+        self._group_accounts = mapping
+
+    def candidates(self, group_id: str) -> List[str]:
+        """在线且在群内的账号，首个为负责账号，其余按顺序作为备用
+
+        使用rendezvous hashing排序，群均匀分摊到各账号，账号增减时其余群的分配不变
+        """
+        now = time.monotonic()
+        members = [
+            self_id for self_id in self._group_accounts.get(group_id, ())
+            if self_id in self._accounts and self._connected(self_id, self._accounts[self_id])
+        ]
+        # 冷却中的账号排在最后，其余账号均不可用时仍会尝试
+        return sorted(
+            members,
+            key=lambda self_id: (
+                self._accounts[self_id]["cooldown_until"] <= now,
+                hashlib.blake2b(f"{group_id}:{self_id}".encode(), digest_size=8).digest()
+            ),
+            reverse=True
+        )
+
+    def is_primary(self, group_id: str, self_id: Any) -> bool:
+        """多个账号同在一个群时，该群的通知只由负责账号处理一次"""
+        candidates = self.candidates(group_id)
+        return not candidates or candidates[0] == str(self_id)
+
+    def account(self, self_id: str) -> Dict[str, Any]:
+        return self._accounts[self_id]
+
+    def record_success(self, self_id: str) -> None:
+        self._accounts[self_id]["failures"] = 0
+
+    def record_failure(self, self_id: str) -> None:
+        """账号调用失败后进入冷却期，连续失败时冷却时间加倍"""
+        account = self._accounts[self_id]
+        account["failures"] += 1
+        account["cooldown_until"] = time.monotonic() + self.cooldown * 2 ** min(account["failures"] - 1, 5)
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+
+class MemberExportWriter:
+    """将群成员数据逐群流式写入临时文件，内存占用仅与单个群的数据量相当"""
+
+    FORMATS = {"xlsx": ".xlsx", "csv": ".csv", "csv.gz": ".csv.gz"}
+
+    def __init__(self, fmt: str = "xlsx"):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        self.fmt = fmt
+        self.rows = 0
+        fd, self.path = tempfile.mkstemp(prefix="group_export_", suffix=self.FORMATS[fmt])
+        os.close(fd)
+
+        self._columns: Optional[List[str]] = None
+        if fmt == "xlsx":
+            # 只写模式下已写入的行会落盘，不在内存中保留整个工作簿
+            self._workbook = openpyxl.Workbook(write_only=True)
+        else:
+            opener = gzip.open if fmt == "csv.gz" else open
+            self._file = opener(self.path, "wt", encoding="utf-8", newline="")
+            self._csv = csv.writer(self._file)
+
+    @staticmethod
+    def _cell(value: Any) -> Any:
+        if value is None or isinstance(value, (str, int, float, bool)):
+            return value
+        return str(value)
+
+    def write_group(self, sheet_name: str, rows: List[Dict[str, Any]]) -> None:
+        """写入一个群的成员数据：xlsx 每群一个sheet，csv 共用同一表头"""
+        if self.fmt == "xlsx":
+            columns = list(dict.fromkeys(key for row in rows for key in row))
+            sheet = self._workbook.create_sheet(title=sheet_name[:31])
+            sheet.append(columns)
+            for row in rows:
+                sheet.append([self._cell(row.get(column)) for column in columns])
+        else:
+            if self._columns is None:
+                self._columns = list(dict.fromkeys(key for row in rows for key in row))
+                if not self._columns:
+                    self._columns = None
+                    return
+                self._csv.writerow(self._columns)
+            self._csv.writerows([row.get(column, "") for column in self._columns] for row in rows)
+        self.rows += len(rows)
+
+    def close(self) -> None:
+        if self.fmt == "xlsx":
+            if not self._workbook.worksheets:
+                self._workbook.create_sheet(title="Sheet1")
+            self._workbook.save(self.path)
+        else:
+            self._file.close()
+
+    def discard(self) -> None:
+        """删除临时文件"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class NormalizedExportWriter:
+    """规范化导出：用户资料去重为用户表，群成员关系单独成表，体积与唯一用户数而非成员总数相关
+
+    xlsx 输出 users / memberships / groups 三个sheet；zip 输出三个按列组织的CSV文件
+    """
+
+    FORMATS = {"xlsx": ".xlsx", "zip": ".zip"}
+
+    def __init__(self, fmt: str = "xlsx"):
+        if fmt not in self.FORMATS:
+            raise ValueError(f"不支持的导出格式: {fmt}")
+        self.fmt = fmt
+        self.rows = 0
+        fd, self.path = tempfile.mkstemp(prefix="group_export_", suffix=self.FORMATS[fmt])
+        os.close(fd)
+
+        self._users: Dict[str, List[Any]] = {}
+        self._groups: List[List[Any]] = []
+        self._membership_columns: Optional[List[str]] = None
+        if fmt == "xlsx":
+            self._workbook = openpyxl.Workbook(write_only=True)
+            self._membership_sheet = None
+        else:
+            self._zip = zipfile.ZipFile(self.path, "w", compression=zipfile.ZIP_DEFLATED)
+            self._membership_file = io.TextIOWrapper(
+                self._zip.open("memberships.csv", "w"), encoding="utf-8", newline=""
+            )
+            self._csv = csv.writer(self._membership_file)
+
+    def _write_membership_row(self, values: List[Any]) -> None:
+        if self.fmt == "xlsx":
+            self._membership_sheet.append(values)
+        else:
+            self._csv.writerow(values)
+
+    def write_group(self, sheet_name: str, rows: List[Dict[str, Any]]) -> None:
+        """写入一个群的成员：资料字段合并进用户表，其余字段追加到成员关系表"""
+        if not rows:
+            return
+        group_id = rows[0].get("group_id", sheet_name.lstrip("G"))
+        self._groups.append([group_id, rows[0].get("group_name", ""), len(rows)])
+
+        if self._membership_columns is None:
+            columns = dict.fromkeys(key for row in rows for key in row)
+            for field in _USER_PROFILE_FIELDS + ("group_id", "group_name"):
+                columns.pop(field, None)
+            self._membership_columns = ["group_id", "user_id"] + list(columns)
+            if self.fmt == "xlsx":
+                self._membership_sheet = self._workbook.create_sheet(title="memberships")
+            self._write_membership_row(self._membership_columns)
+
+        member_columns = self._membership_columns[2:]
+        for row in rows:
+            user_id = row.get("user_id")
+            if user_id not in self._users:
+                self._users[user_id] = [MemberExportWriter._cell(row.get(field)) for field in _USER_PROFILE_FIELDS]
+            self._write_membership_row(
+                [group_id, user_id] + [MemberExportWriter._cell(row.get(column)) for column in member_columns]
+            )
+        self.rows += len(rows)
+
+    @property
+    def unique_users(self) -> int:
+        return len(self._users)
+
+    def close(self) -> None:
+        tables = (
+            ("users", list(_USER_PROFILE_FIELDS), self._users.values()),
+            ("groups", ["group_id", "group_name", "member_count"], self._groups),
+        )
+        if self.fmt == "xlsx":
+            if self._membership_sheet is None:
+                self._workbook.create_sheet(title="memberships")
+            for title, header, values in tables:
+                sheet = self._workbook.create_sheet(title=title)
+                sheet.append(header)
+                for row in values:
+                    sheet.append(row)
+            self._workbook.save(self.path)
+        else:
+            self._membership_file.close()
+            for title, header, values in tables:
+                with io.TextIOWrapper(self._zip.open(f"{title}.csv", "w"), encoding="utf-8", newline="") as f:
+                    writer = csv.writer(f)
+                    writer.writerow(header)
+                    writer.writerows(values)
+            self._zip.close()
+
+    def discard(self) -> None:
+        """删除临时文件"""
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class MemberSnapshotStore:
+    """各群最近一次成功推送的成员快照（SQLite），用于计算增量同步内容"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS member_snapshot (
+                group_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                profile_hash TEXT NOT NULL,
+                PRIMARY KEY (group_id, user_id)
+            )"""
+        )
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS sync_state (
+                group_id TEXT PRIMARY KEY,
+                last_synced REAL NOT NULL,
+                change_rate REAL NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def profile_hash(member: Dict[str, Any]) -> str:
+        profile = f"{member.get('nickname', '')}\x00{member.get('card', '')}"
+        return hashlib.blake2b(profile.encode("utf-8"), digest_size=8).hexdigest()
+
+    def has_group(self, group_id: str) -> bool:
+        return self._conn.execute(
+            "SELECT 1 FROM member_snapshot WHERE group_id = ? LIMIT 1", (group_id,)
+        ).fetchone() is not None
+
+    def diff(self, group_id: str, members: List[Dict[str, Any]]) -> tuple:
+        """与快照比较，返回 (新增或资料变更的成员, 已退群的user_id列表)"""
+        snapshot = dict(self._conn.execute(
+            "SELECT user_id, profile_hash FROM member_snapshot WHERE group_id = ?", (group_id,)
+        ))
+        upserts = [m for m in members if snapshot.pop(m["user_id"], None) != self.profile_hash(m)]
+        return upserts, list(snapshot)
+
+    def replace(self, group_id: str, members: List[Dict[str, Any]]) -> None:
+        """以本次推送的成员集合覆盖该群快照"""
+        with self._conn:
+            self._conn.execute("DELETE FROM member_snapshot WHERE group_id = ?", (group_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO member_snapshot (group_id, user_id, profile_hash) VALUES (?, ?, ?)",
+                [(group_id, m["user_id"], self.profile_hash(m)) for m in members]
+            )
+
+    def record_sync(self, group_id: str, change_ratio: Optional[float] = None) -> None:
+        """记录同步时间；change_ratio 为本次变化成员占比，按指数滑动平均计入变化率"""
+        with self._conn:
+            if change_ratio is None:
+                self._conn.execute(
+                    "INSERT INTO sync_state (group_id, last_synced) VALUES (?, ?) "
+                    "ON CONFLICT (group_id) DO UPDATE SET last_synced = excluded.last_synced",
+                    (group_id, time.time())
+                )
+            else:
+                self._conn.execute(
+                    "INSERT INTO sync_state (group_id, last_synced, change_rate) VALUES (?, ?, ?) "
+                    "ON CONFLICT (group_id) DO UPDATE SET last_synced = excluded.last_synced, "
+                    "change_rate = change_rate * 0.5 + excluded.change_rate * 0.5",
+                    (group_id, time.time(), change_ratio)
+                )
+
+    def sync_state(self) -> Dict[str, tuple]:
+        """各群 (上次同步时间, 变化率)"""
+        return {
+            group_id: (last_synced, change_rate) for group_id, last_synced, change_rate in self._conn.execute(
+                "SELECT group_id, last_synced, change_rate FROM sync_state"
+            )
+        }
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class MemberIndex:
+    """跨群成员索引（SQLite），支持按QQ查所在群及按昵称/名片前缀、子串检索"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS members (
+                group_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                nickname TEXT NOT NULL DEFAULT '',
+                card TEXT NOT NULL DEFAULT '',
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (group_id, user_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_members_user ON members (user_id);
+            CREATE INDEX IF NOT EXISTS idx_members_nickname ON members (nickname COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS idx_members_card ON members (card COLLATE NOCASE);
+            CREATE TABLE IF NOT EXISTS groups (
+                group_id TEXT PRIMARY KEY,
+                group_name TEXT NOT NULL DEFAULT ''
+            );"""
+        )
+        # 三元组全文索引用于子串检索，SQLite版本不支持时退回LIKE扫描
+        try:
+            self._conn.executescript(
+                """CREATE VIRTUAL TABLE IF NOT EXISTS members_fts USING fts5(
+                    nickname, card, content='members', content_rowid='rowid', tokenize='trigram'
+                );
+                CREATE TRIGGER IF NOT EXISTS members_ai AFTER INSERT ON members BEGIN
+                    INSERT INTO members_fts (rowid, nickname, card) VALUES (new.rowid, new.nickname, new.card);
+                END;
+                CREATE TRIGGER IF NOT EXISTS members_ad AFTER DELETE ON members BEGIN
+                    INSERT INTO members_fts (members_fts, rowid, nickname, card)
+                    VALUES ('delete', old.rowid, old.nickname, old.card);
+                END;
+                CREATE TRIGGER IF NOT EXISTS members_au AFTER UPDATE ON members BEGIN
+                    INSERT INTO members_fts (members_fts, rowid, nickname, card)
+                    VALUES ('delete', old.rowid, old.nickname, old.card);
+                    INSERT INTO members_fts (rowid, nickname, card) VALUES (new.rowid, new.nickname, new.card);
+                END;"""
+            )
+            self.fts_enabled = True
+        except sqlite3.OperationalError:
+            self.fts_enabled = False
+        self._conn.commit()
+
+    def replace_group(self, group_id: str, members: List[Dict[str, Any]]) -> None:
+        """以最新获取的成员列表覆盖该群的索引"""
+        now = time.time()
+        with self._conn:
+            self._conn.execute("DELETE FROM members WHERE group_id = ?", (group_id,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO members (group_id, user_id, nickname, card, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (group_id, str(m["user_id"]), m.get("nickname") or "", m.get("card") or "", now)
+                    for m in members if "user_id" in m
+                ]
+            )
+
+    def update_groups(self, groups: List[Dict[str, Any]], prune: bool = False) -> None:
+        """更新群名称；prune 为 True 表示群列表完整，同时移除机器人已不在的群及其成员"""
+        rows = [(str(g["group_id"]), g.get("group_name") or "") for g in groups if "group_id" in g]
+        with self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO groups (group_id, group_name) VALUES (?, ?)", rows)
+            if prune:
+                current = {group_id for group_id, _ in rows}
+                stale = [
+                    (group_id,) for (group_id,) in self._conn.execute(
+                        "SELECT group_id FROM groups UNION SELECT DISTINCT group_id FROM members"
+                    ) if group_id not in current
+                ]
+                self._conn.executemany("DELETE FROM members WHERE group_id = ?", stale)
+                self._conn.executemany("DELETE FROM groups WHERE group_id = ?", stale)
+
+    def remove_group(self, group_id: str) -> None:
+        """机器人退群后移除该群的成员索引"""
+        with self._conn:
+            self._conn.execute("DELETE FROM members WHERE group_id = ?", (group_id,))
+            self._conn.execute("DELETE FROM groups WHERE group_id = ?", (group_id,))
+
+    def remove_member(self, group_id: str, user_id: str) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM members WHERE group_id = ? AND user_id = ?", (group_id, user_id))
+
+    def update_card(self, group_id: str, user_id: str, card: str) -> None:
+        with self._conn:
+            self._conn.execute(
+                "UPDATE members SET card = ?, updated_at = ? WHERE group_id = ? AND user_id = ?",
+                (card, time.time(), group_id, user_id)
+            )
+
+    def groups_of_user(self, user_id: str) -> List[tuple]:
+        """查询成员所在的群：(group_id, group_name, nickname, card)"""
+        return self._conn.execute(
+            "SELECT m.group_id, COALESCE(g.group_name, ''), m.nickname, m.card FROM members m "
+            "LEFT JOIN groups g ON g.group_id = m.group_id WHERE m.user_id = ? ORDER BY m.group_id",
+            (user_id,)
+        ).fetchall()
+
+    def search(self, keyword: str, limit: int) -> List[tuple]:
+        """按昵称/名片检索成员，前缀匹配优先：(user_id, nickname, card, group_id, group_name)"""
+        columns = "m.user_id, m.nickname, m.card, m.group_id, COALESCE(g.group_name, '')"
+        prefix = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        order = "ORDER BY (m.nickname LIKE ? ESCAPE '\\' OR m.card LIKE ? ESCAPE '\\') DESC, m.user_id"
+        if self.fts_enabled and len(keyword) >= 3:
+            phrase = '"' + keyword.replace('"', '""') + '"'
+            return self._conn.execute(
+                f"SELECT {columns} FROM members_fts f JOIN members m ON m.rowid = f.rowid "
+                f"LEFT JOIN groups g ON g.group_id = m.group_id WHERE members_fts MATCH ? {order} LIMIT ?",
+                (phrase, prefix, prefix, limit)
+            ).fetchall()
+
+        pattern = "%" + prefix
+        return self._conn.execute(
+            f"SELECT {columns} FROM members m LEFT JOIN groups g ON g.group_id = m.group_id "
+            f"WHERE m.nickname LIKE ? ESCAPE '\\' OR m.card LIKE ? ESCAPE '\\' {order} LIMIT ?",
+            (pattern, pattern, prefix, prefix, limit)
+        ).fetchall()
+
+    def stats(self) -> tuple:
+        """(成员记录数, 不同QQ数, 群数)"""
+        return self._conn.execute(
+            "SELECT COUNT(*), COUNT(DISTINCT user_id), COUNT(DISTINCT group_id) FROM members"
+        ).fetchone()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class MarkKeyQueue:
+    """卡密使用记录的本地预写队列（SQLite），确保标记请求在崩溃或接口故障后不丢失"""
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS mark_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id TEXT NOT NULL,
+                key TEXT NOT NULL,
+                used_by TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt REAL NOT NULL DEFAULT 0
+            )"""
+        )
+        self._conn.commit()
+
+    def push(self, group_id: str, key: str, used_by: str) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO mark_queue (group_id, key, used_by, created_at) VALUES (?, ?, ?, ?)",
+                (group_id, key, used_by, time.time())
+            )
+
+    def due(self, limit: int) -> List[tuple]:
+        """取出已到重试时间的记录：(id, group_id, key, used_by, attempts)"""
+        return self._conn.execute(
+            "SELECT id, group_id, key, used_by, attempts FROM mark_queue "
+            "WHERE next_attempt <= ? ORDER BY id LIMIT ?",
+            (time.time(), limit)
+        ).fetchall()
+
+    def pending(self) -> List[tuple]:
+        """全部未推送记录：(group_id, key, used_by)"""
+        return self._conn.execute("SELECT group_id, key, used_by FROM mark_queue").fetchall()
+
+    def next_due_in(self) -> Optional[float]:
+        row = self._conn.execute("SELECT MIN(next_attempt) FROM mark_queue").fetchone()
+        return None if row[0] is None else max(0.0, row[0] - time.time())
+
+    def remove(self, ids: List[int]) -> None:
+        with self._conn:
+            self._conn.executemany("DELETE FROM mark_queue WHERE id = ?", [(i,) for i in ids])
+
+    def reschedule(self, rows: List[tuple], delays: List[float]) -> None:
+        now = time.time()
+        with self._conn:
+            self._conn.executemany(
+                "UPDATE mark_queue SET attempts = attempts + 1, next_attempt = ? WHERE id = ?",
+                [(now + delay, row[0]) for row, delay in zip(rows, delays)]
+            )
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM mark_queue").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+class JobStore:
+    """后台任务及其逐群进度检查点（SQLite），中断后可从检查点继续"""
+
+    ACTIVE = ("queued", "running")
+
+    def __init__(self, db_path: str):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                job_id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                total INTEGER NOT NULL DEFAULT 0,
+                message TEXT NOT NULL DEFAULT ''
+            );
+            CREATE TABLE IF NOT EXISTS job_groups (
+                job_id TEXT NOT NULL,
+                group_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                ok INTEGER NOT NULL,
+                detail TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (job_id, group_id)
+            );"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def _row(row: Optional[tuple]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job_id, kind, params, status, created_at, updated_at, total, message = row
+        return {
+            "job_id": job_id, "kind": kind, "params": json.loads(params), "status": status,
+            "created_at": created_at, "updated_at": updated_at, "total": total, "message": message
+        }
+
+    def create(self, kind: str, params: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex[:8]
+        now = time.time()
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, kind, params, status, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?)",
+                (job_id, kind, json.dumps(params), now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._row(self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone())
+
+    def recent(self, limit: int) -> List[Dict[str, Any]]:
+        rows = self._conn.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,))
+        return [self._row(row) for row in rows]
+
+    def active(self, kind: str) -> Optional[Dict[str, Any]]:
+        """同类型中排队或运行中的任务"""
+        return self._row(self._conn.execute(
+            "SELECT * FROM jobs WHERE kind = ? AND status IN (?, ?) ORDER BY created_at LIMIT 1",
+            (kind,) + self.ACTIVE
+        ).fetchone())
+
+    def set_status(self, job_id: str, status: str, message: Optional[str] = None) -> None:
+        with self._conn:
+            if message is None:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?", (status, time.time(), job_id)
+                )
+            else:
+                self._conn.execute(
+                    "UPDATE jobs SET status = ?, message = ?, updated_at = ? WHERE job_id = ?",
+                    (status, message, time.time(), job_id)
+                )
+
+    def set_total(self, job_id: str, total: int) -> None:
+        with self._conn:
+            self._conn.execute("UPDATE jobs SET total = ?, updated_at = ? WHERE job_id = ?", (total, time.time(), job_id))
+
+    def mark_interrupted(self) -> int:
+        """启动时将上次未结束的任务标记为已中断"""
+        with self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'interrupted' WHERE status IN (?, ?)", self.ACTIVE
+            ).rowcount
+
+    def checkpoint(self, job_id: str, group_id: str, position: int, ok: bool, detail: str) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_groups (job_id, group_id, position, ok, detail) VALUES (?, ?, ?, ?, ?)",
+                (job_id, group_id, position, int(ok), detail)
+            )
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (time.time(), job_id))
+
+    def results(self, job_id: str) -> List[tuple]:
+        """已完成的群：(group_id, 是否成功, 详情)，按群列表顺序"""
+        return [
+            (group_id, bool(ok), detail) for group_id, ok, detail in self._conn.execute(
+                "SELECT group_id, ok, detail FROM job_groups WHERE job_id = ? ORDER BY position", (job_id,)
+            )
+        ]
+
+    def progress(self, job_id: str) -> tuple:
+        """(已处理群数, 失败群数)"""
+        done, failed = self._conn.execute(
+            "SELECT COUNT(*), COUNT(*) - COALESCE(SUM(ok), 0) FROM job_groups WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return done, failed
+
+    def prune(self, keep: int) -> List[str]:
+        """仅保留最近的 keep 条任务记录（进行中的不删除），返回被删除的任务ID"""
+        job_ids = [row[0] for row in self._conn.execute(
+            "SELECT job_id FROM jobs WHERE status NOT IN (?, ?) ORDER BY created_at DESC LIMIT -1 OFFSET ?",
+            self.ACTIVE + (keep,)
+        )]
+        with self._conn:
+            self._conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(job_id,) for job_id in job_ids])
+            self._conn.executemany("DELETE FROM job_groups WHERE job_id = ?", [(job_id,) for job_id in job_ids])
+        return job_ids
+
+    def close(self) -> None:
+        self._conn.close()
 
 
 @register(
@@ -35,28 +1005,265 @@ class GroupInformationPlugin(Star):
         self.API_TIMEOUT = 10  # API请求超时时间(秒)
         self.API_RETRIES = 3  # API请求重试次数
         self.API_BASE_URL = "https://qun.yz01.baby/api/"  # 基础API地址
-        self.REQUEST_DELAY = 1  # 接口请求延迟(秒)，防止频率限制
-        
-        # 初始化带重试机制的请求会话
-        self.api_session = self._create_retry_session()
-
-    def _create_retry_session(self) -> requests.Session:
-        """创建支持自动重试的请求会话"""
-        session = requests.Session()
-        retry_strategy = Retry(
-            total=self.API_RETRIES,
-            backoff_factor=0.5,
-            status_forcelist=[429, 500, 502, 503, 504]
+        self.ONEBOT_RATE = 5  # OneBot接口每秒请求数
+        self.ONEBOT_BURST = 10  # OneBot接口突发请求数
+        self.ACCOUNT_COOLDOWN = 30  # 多账号时单个账号调用失败后暂停分配的时间(秒)，连续失败时加倍
+        self.API_RATE = 20  # 业务API每秒请求数
+        self.API_BURST = 40  # 业务API突发请求数
+        self.FETCH_CONCURRENCY = 5  # 批量获取群成员时的并发群数
+        self.EXPORT_FORMAT = "xlsx"  # 全部群导出的默认格式：xlsx / csv / csv.gz，可在命令后指定
+        self.EXPORT_NORMALIZED = False  # 全部群导出默认是否使用规范化（用户表+成员关系表）格式，命令中含“规范化”时也启用
+        self.UPLOAD_MODE = "file"  # 大文件上传方式：file(file://路径) / http(本地HTTP服务) / base64
+        self.UPLOAD_BASE64_THRESHOLD = 1024 * 1024  # 不超过该大小(字节)的文件直接base64内联上传
+        self.UPLOAD_SHARED_DIR = ""  # 协议端可访问的共享目录，留空则直接使用临时文件路径
+        self.UPLOAD_SHARED_DIR_REMOTE = ""  # 共享目录在协议端中的路径，留空表示与本地相同
+        self.UPLOAD_HTTP_HOST = "127.0.0.1"  # http模式下文件服务监听地址
+        self.UPLOAD_HTTP_PORT = 6190  # http模式下文件服务端口
+        self.UPLOAD_HTTP_PUBLIC_URL = ""  # 协议端访问文件服务的地址，留空则使用监听地址
+        self.API_BACKOFF_FACTOR = 0.5  # 重试退避系数(秒)，第n次重试等待 factor * 2^(n-1)
+        self.API_RETRY_STATUS = (429, 500, 502, 503, 504)  # 需要重试的HTTP状态码
+        self.API_POOL_SIZE = 100  # API连接池最大连接数
+        self.API_KEEPALIVE = 30  # 空闲连接保活时间(秒)
+        self.VERIFY_BATCH_WINDOW = 0.02  # 卡密验证请求的合批等待时间(秒)
+        self.VERIFY_BATCH_SIZE = 50  # 单次批量验证的最大卡密数
+        self.VERIFY_MAX_INFLIGHT = 10  # 同时进行中的验证请求上限
+        self.VERIFY_BULK_ENDPOINT = "check_keys.php"  # 批量验证接口，不可用时自动降级为单条验证
+        self.KEY_CACHE_SIZE = 10000  # 卡密验证结果缓存条数
+        self.KEY_CACHE_TTL_VALID = 30  # 有效卡密结果缓存时间(秒)
+        self.KEY_CACHE_TTL_INVALID = 600  # 无效卡密结果缓存时间(秒)
+        self.KEY_CLAIM_TTL = 86400  # 已通过卡密的本地占用记录保留时间(秒)
+        self.BREAKER_FAILURE_RATE = 0.5  # 熔断触发的失败率阈值
+        self.BREAKER_WINDOW = 20  # 统计失败率的最近请求数
+        self.BREAKER_MIN_CALLS = 5  # 触发熔断前的最少请求数
+        self.BREAKER_OPEN_TIME = 30  # 熔断后等待半开探测的时间(秒)
+        self.DEFERRED_QUEUE_SIZE = 500  # 熔断期间暂存的加群请求上限
+        self.DEFERRED_RETRY_INTERVAL = 5  # 暂存请求的探测间隔(秒)
+        self.DEFERRED_MAX_AGE = 3600  # 暂存请求的最长等待时间(秒)，超时后拒绝
+        self.DATA_DIR = os.path.join("data", "plugin_data", "astrbot_plugin_shenhe")  # 本地数据目录
+        self.MARK_BULK_ENDPOINT = "mark_keys.php"  # 批量标记接口，不可用时自动降级为单条标记
+        self.MARK_BATCH_SIZE = 50  # 单次推送的卡密使用记录数
+        self.MARK_FLUSH_INTERVAL = 2  # 卡密使用记录推送间隔(秒)
+        self.MARK_BACKOFF_BASE = 5  # 推送失败的首次重试等待(秒)，之后指数增长
+        self.MARK_BACKOFF_MAX = 600  # 推送失败的最长重试等待(秒)
+        self.DELTA_SYNC = True  # 批量同步群成员时仅推送变化部分，命令中带"全量"时强制全量推送
+        self.DELTA_PUSH_ENDPOINT = "push_group_members_delta.php"  # 增量推送接口，不可用时自动改为全量推送
+        self.PUSH_BATCH_ENDPOINT = "push_group_members_batch.php"  # 多群合并推送接口，不可用时逐群推送
+        self.PUSH_BATCH_BYTES = 512 * 1024  # 单次合并推送的请求体上限(字节)，超出的群拆分为分片
+        self.PUSH_BATCH_WINDOW = 0.2  # 合并推送的等待时间(秒)
+        self.PUSH_MAX_INFLIGHT = 4  # 同时进行中的合并推送请求上限
+        self.PUSH_GZIP = True  # 合并推送使用gzip压缩，服务端返回415时自动关闭
+        self.GROUP_LIST_CACHE_TTL = 600  # 群列表缓存时间(秒)，入群/退群通知会即时更新
+        self.MEMBER_CACHE_TTL = 300  # 群成员列表缓存时间(秒)，成员变动通知会即时更新
+        self.MEMBER_CACHE_SIZE = 500  # 缓存成员列表的群数上限
+        self.MEMBER_SEARCH_LIMIT = 20  # 成员检索返回的最大条数
+        self.JOB_MAX_HEAVY = 1  # 同时运行的导出/同步后台任务数，其余任务排队等待
+        self.JOB_HISTORY = 20  # 保留的后台任务记录数
+        self.SYNC_SCHEDULE = True  # 自动定时同步群成员，在时间窗口内错峰逐群进行
+        self.SYNC_WINDOW = 6 * 3600  # 每个群至少同步一次的时间窗口(秒)
+        self.SYNC_MAX_PRIORITY = 3  # 大群或变化频繁的群在一个窗口内最多同步的次数
+        self.SYNC_LARGE_GROUP = 1000  # 达到该人数的群按最高优先级同步
+        self.SYNC_HIGH_CHANGE_RATE = 0.05  # 每次同步平均变化成员占比达到该值的群按最高优先级同步
+        self.SYNC_MIN_GAP = 2  # 两次定时同步之间的最短间隔(秒)
+        self.SYNC_BACKOFF_MAX = 16  # 连续失败时同步间隔的最大放大倍数
+        self.METRICS_ENABLED = True  # 记录外部调用耗时、API重试次数、导出各阶段耗时与事件循环延迟
+        self.METRICS_LAG_INTERVAL = 1.0  # 事件循环延迟采样间隔(秒)
+        self.METRICS_FILE = ""  # 定期写出Prometheus格式指标的文件路径，为空时不写出
+        self.METRICS_FILE_INTERVAL = 15  # 指标文件写出间隔(秒)
+        self.METRICS_HTTP_HOST = "127.0.0.1"  # Prometheus /metrics 端点监听地址
+        self.METRICS_HTTP_PORT = 0  # Prometheus /metrics 端点端口，为0时不启用
+
+        # 性能指标，关闭时计时与计数均为空操作
+        self._metrics = Metrics(self.METRICS_ENABLED)
+        self._metrics_worker: Optional[asyncio.Task] = None
+        self._metrics_server: Optional[web.AppRunner] = None
+
+        # 异步请求会话，首次使用时在事件循环内创建
+        self.api_session: Optional[aiohttp.ClientSession] = None
+
+        # OneBot接口与业务API分别限流，所有请求节奏统一经由令牌桶控制
+        self._onebot_limiter = TokenBucket(self.ONEBOT_RATE, self.ONEBOT_BURST)
+        self._api_limiter = TokenBucket(self.API_RATE, self.API_BURST)
+
+        # 多账号分片：各账号独立限流，群成员由所在的负责账号获取，推送时上报该账号
+        self._accounts = BotAccountPool(self.ONEBOT_RATE, self.ONEBOT_BURST, self.ACCOUNT_COOLDOWN)
+        self._group_owner: Dict[str, str] = {}
+
+        # 卡密验证队列，首次收到加群请求时启动
+        self._verify_queue: Optional[asyncio.Queue] = None
+        self._verify_worker: Optional[asyncio.Task] = None
+        self._verify_semaphore: Optional[asyncio.Semaphore] = None
+        self._bulk_verify_supported = True
+
+        # 卡密验证结果缓存、进行中的验证请求及已本地占用的卡密
+        self._key_cache = TTLCache(self.KEY_CACHE_SIZE)
+        self._key_inflight: Dict[tuple, asyncio.Task] = {}
+        self._claimed_keys = TTLCache(self.KEY_CACHE_SIZE)
+
+        # 验证接口熔断器及熔断期间暂存的加群请求
+        self._verify_breaker = CircuitBreaker(
+            "check_key",
+            failure_rate=self.BREAKER_FAILURE_RATE,
+            window=self.BREAKER_WINDOW,
+            min_calls=self.BREAKER_MIN_CALLS,
+            open_time=self.BREAKER_OPEN_TIME
         )
-        adapter = HTTPAdapter(max_retries=retry_strategy)
-        session.mount("https://", adapter)
-        session.mount("http://", adapter)
-        return session
+        self._deferred_requests: deque = deque()
+        self._deferred_worker: Optional[asyncio.Task] = None
+        self._deferred_since: Dict[str, float] = {}
+        # 已受理的加群请求flag，多个账号同在一个群时同一请求只处理一次
+        self._seen_join_flags = TTLCache(self.KEY_CACHE_SIZE)
+
+        # 跨群成员索引，随每次成员获取更新
+        self._member_index = MemberIndex(os.path.join(self.DATA_DIR, "member_index.db"))
+
+        # 群成员快照，用于增量同步
+        self._member_snapshots = MemberSnapshotStore(os.path.join(self.DATA_DIR, "member_snapshot.db"))
+        self._delta_push_supported = True
+
+        # 群列表与群成员缓存，由OneBot通知事件保持更新
+        self._group_list_cache = TTLCache(1)
+        self._member_cache = TTLCache(self.MEMBER_CACHE_SIZE)
+        self._cache_stats: Dict[str, List[int]] = {"group_list": [0, 0], "members": [0, 0]}
+
+        # 成员推送合并队列
+        self._push_queue: Optional[asyncio.Queue] = None
+        self._push_worker: Optional[asyncio.Task] = None
+        self._push_semaphore: Optional[asyncio.Semaphore] = None
+        self._batch_push_supported = True
+        self._gzip_push_supported = True
+
+        # 卡密使用记录预写队列，重启后未推送的卡密继续保持本地占用
+        self._mark_queue = MarkKeyQueue(os.path.join(self.DATA_DIR, "mark_queue.db"))
+        for group_id, key, used_by in self._mark_queue.pending():
+            self._claimed_keys.set((group_id, key), (None, used_by), self.KEY_CLAIM_TTL)
+        self._mark_wakeup: Optional[asyncio.Event] = None
+        self._mark_worker: Optional[asyncio.Task] = None
+        self._bulk_mark_supported = True
+        try:
+            asyncio.get_running_loop()
+            self._ensure_mark_worker()
+        except RuntimeError:
+            pass
+
+        # 定时错峰同步，失败时按倍数拉长同步间隔
+        self._sync_scheduler: Optional[asyncio.Task] = None
+        self._sync_backoff = 1
+        self._sync_next: Optional[tuple] = None
+        try:
+            asyncio.get_running_loop()
+            self._ensure_sync_scheduler()
+            self._ensure_metrics_worker()
+        except RuntimeError:
+            pass
+
+        # http上传模式下的本地文件服务及可下载文件
+        self._file_server: Optional[web.AppRunner] = None
+        self._served_files: Dict[str, str] = {}
+
+        # 导出/同步后台任务，上次未结束的任务标记为已中断，可手动恢复
+        self._job_store = JobStore(os.path.join(self.DATA_DIR, "jobs.db"))
+        self._job_store.mark_interrupted()
+        self._job_tasks: Dict[str, asyncio.Task] = {}
+        self._job_semaphore: Optional[asyncio.Semaphore] = None
+        self._cancelled_jobs: set = set()
+
+        # 后台任务引用，防止任务在执行中被回收
+        self._background_tasks: set = set()
+
+    async def terminate(self):
+        """插件卸载时释放资源"""
+        for worker in (
+            self._verify_worker, self._deferred_worker, self._mark_worker, self._push_worker, self._sync_scheduler,
+            self._metrics_worker
+        ):
+            if worker and not worker.done():
+                worker.cancel()
+        for task in list(self._background_tasks):
+            task.cancel()
+        if self.api_session and not self.api_session.closed:
+            await self.api_session.close()
+        if self._file_server:
+            await self._file_server.cleanup()
+        if self._metrics_server:
+            await self._metrics_server.cleanup()
+        self._mark_queue.close()
+        self._member_snapshots.close()
+        self._member_index.close()
+        self._job_store.close()
+
+    def _spawn(self, coro) -> asyncio.Task:
+        """创建后台任务并保留引用直至完成"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+
+    def _get_api_session(self) -> aiohttp.ClientSession:
+        """获取复用连接的异步请求会话"""
+        if self.api_session is None or self.api_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.API_POOL_SIZE,
+                keepalive_timeout=self.API_KEEPALIVE,
+                ttl_dns_cache=300
+            )
+            self.api_session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.API_TIMEOUT)
+            )
+        return self.api_session
+
+    async def _api_request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Any = None,
+        data: Optional[bytes] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> Any:
+        """请求API并解析JSON，按状态码和网络错误自动重试"""
+        url = f"{self.API_BASE_URL}{endpoint}"
+        for attempt in range(self.API_RETRIES + 1):
+            retry_after = None
+            await self._api_limiter.acquire()
+            try:
+                with self._metrics.timer(
+                    "shenhe_external_call_seconds", "shenhe_external_calls_total", call=f"api:{endpoint}"
+                ) as timer:
+                    async with self._get_api_session().request(
+                        method, url, params=params, json=json, data=data, headers=headers
+                    ) as response:
+                        if response.status not in self.API_RETRY_STATUS or attempt >= self.API_RETRIES:
+                            response.raise_for_status()
+                            return await response.json(content_type=None)
+                        # 将重试的429/5xx响应按状态码计数，不计为成功
+                        timer.mark(f"retry_{response.status}")
+                        retry_after = response.headers.get("Retry-After")
+                        if response.status == 429:
+                            self._api_limiter.penalize(
+                                float(retry_after) if retry_after and retry_after.isdigit() else None
+                            )
+            except aiohttp.ClientResponseError:
+                # 不在重试范围内的状态码（如404、415）直接抛出，由调用方降级处理
+                raise
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt >= self.API_RETRIES:
+                    raise
+
+            # 退避后重试，429优先遵循服务端的Retry-After
+            self._metrics.inc("shenhe_api_retries_total", endpoint=endpoint)
+            delay = self.API_BACKOFF_FACTOR * (2 ** attempt)
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
 
     @staticmethod
     def _format_timestamp(timestamp: Any) -> str:
         """格式化时间戳为可读字符串"""
         try:
+            # 整数时间戳走 time.strftime 快速路径，结果与 datetime 一致
+            if isinstance(timestamp, int) and 0 < timestamp < _MAX_FAST_TIMESTAMP:
+                return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
             if isinstance(timestamp, (int, float)) and timestamp > 0:
                 return datetime.fromtimestamp(float(timestamp)).strftime(
                     "%Y-%m-%d %H:%M:%S"
@@ -69,7 +1276,7 @@ class GroupInformationPlugin(Star):
     def _clean_excel_invalid_chars(text: Any) -> Any:
         """清理Excel不支持的特殊字符"""
         if isinstance(text, str):
-            return "".join(char for char in text if ord(char) >= 32 and char not in "\x00\x01\x02\x03")
+            return _EXCEL_INVALID_CHARS.sub("", text)
         return text
 
     # ------------------------------
@@ -84,141 +1291,509 @@ class GroupInformationPlugin(Star):
             yield event.plain_result("请在群聊中使用此命令或指定有效的群号（格式：导出群数据 123456）")
             return
 
-        try:
-            client = event.bot
-            
-            # 验证机器人是否在该群
-            if not await self._is_bot_in_group(client, group_id):
-                yield event.plain_result(f"机器人不在群 {group_id} 中，无法导出数据")
-                return
+        try:
+            client = event.bot
+            refresh = "刷新" in event.get_plaintext()
+            
+            # 验证机器人是否在该群
+            if not await self._is_bot_in_group(client, group_id, refresh):
+                yield event.plain_result(f"机器人不在群 {group_id} 中，无法导出数据")
+                return
+
+            # 获取群成员列表
+            try:
+                with self._export_stage("fetch"):
+                    members = await self._get_group_members_raw(client, group_id, refresh)
+            except ValueError:
+                yield event.plain_result("获取群成员数据失败")
+                return
+
+            # 处理并生成Excel
+            with self._export_stage("process"):
+                processed_members = self._process_members(members)
+            with self._export_stage("write"):
+                file_path = self._generate_excel_file(processed_members, f"Group_{group_id}")
+            file_name = f"群{group_id}_成员数据_{len(processed_members)}人.xlsx"
+            
+            # 上传文件
+            try:
+                with self._export_stage("upload"):
+                    result = await self._upload_file(
+                        event, 
+                        file_path, 
+                        file_name,
+                        is_group=event.message_obj.type == MessageType.GROUP_MESSAGE
+                    )
+            finally:
+                os.remove(file_path)
+            
+            if result:
+                yield event.plain_result(f"群成员数据导出成功，共 {len(processed_members)} 人")
+            else:
+                yield event.plain_result("文件上传失败，请稍后重试")
+
+        except Exception as e:
+            logger.error(f"导出群数据错误: {str(e)}", exc_info=True)
+            yield event.plain_result(f"操作失败: {str(e)}")
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("导出所有群数据")
+    async def export_all_groups_data(self, event: AiocqhttpMessageEvent):
+        """导出机器人加入的所有群成员信息（后台任务）"""
+        text = event.get_plaintext()
+        export_format = self._extract_export_format(text)
+        normalized = self.EXPORT_NORMALIZED or "规范化" in text or "去重" in text
+        if normalized:
+            # 规范化导出只提供xlsx和zip（多个CSV表）两种形式
+            export_format = "xlsx" if export_format == "xlsx" else "zip"
+        elif export_format == "zip":
+            export_format = "csv.gz"
+
+        params = {"format": export_format, "normalized": normalized, "refresh": "刷新" in text}
+        yield event.plain_result(self._start_job(event, "export", params))
+
+    async def _run_export_job(self, job_id: str, params: Dict[str, Any], event: AiocqhttpMessageEvent) -> str:
+        """逐群获取成员并写入检查点文件，全部完成后汇总生成导出文件并上传"""
+        client = event.bot
+        refresh = params["refresh"]
+        export_format = params["format"]
+        normalized = params["normalized"]
+        group_list = await self._get_group_list(client, refresh)
+        if not group_list:
+            return "机器人未加入任何群组"
+
+        self._job_store.set_total(job_id, len(group_list))
+        # 只跳过已成功的群，失败的群恢复任务时重新处理并覆盖原检查点
+        done = {group_id for group_id, ok, _ in self._job_store.results(job_id) if ok}
+        pending = [group for group in group_list if str(group["group_id"]) not in done]
+        positions = {str(group["group_id"]): idx for idx, group in enumerate(group_list)}
+        mode = "规范化" if normalized else ""
+        resumed = f"，从检查点继续，剩余 {len(pending)} 个" if done else ""
+        await event.send(event.plain_result(
+            f"任务 {job_id}：发现 {len(group_list)} 个群组{resumed}，开始导出数据（{mode}{export_format}）..."
+        ))
+
+        spool_dir = self._job_spool_dir(job_id)
+        os.makedirs(spool_dir, exist_ok=True)
+
+        async def fetch(group: Dict[str, Any]) -> Any:
+            with self._export_stage("fetch"):
+                return await self._get_group_members_raw(client, str(group["group_id"]), refresh, cache=False)
+
+        # 并发获取成员列表，每完成一个群即落盘并记录检查点
+        async for group, members, error in self._fetch_groups_concurrently(pending, fetch):
+            group_id = str(group["group_id"])
+            group_name = self._clean_excel_invalid_chars(group["group_name"])
+            try:
+                if error is not None:
+                    raise error
+                if not isinstance(members, list):
+                    self._job_store.checkpoint(
+                        job_id, group_id, positions[group_id], False, f"{group_name}({group_id}): 成员数据无效"
+                    )
+                    continue
+
+                with self._export_stage("process"):
+                    processed_members = self._process_members(members)
+                    for member in processed_members:
+                        member["group_name"] = group_name
+                with self._export_stage("spool"):
+                    self._write_spool(os.path.join(spool_dir, f"{group_id}.json.gz"), processed_members)
+                self._job_store.checkpoint(job_id, group_id, positions[group_id], True, "")
+
+            except Exception as e:
+                self._job_store.checkpoint(
+                    job_id, group_id, positions[group_id], False, f"{group_name}({group_id}): {str(e)[:30]}"
+                )
+                logger.warning(f"处理群 {group_id} 失败: {str(e)}")
+
+        # 按群列表顺序逐群流式写入导出文件，不在内存中保留全部数据
+        writer = NormalizedExportWriter(export_format) if normalized else MemberExportWriter(export_format)
+        total_members = 0
+        failed_groups = []
+        try:
+            with self._export_stage("write"):
+                for group_id, ok, detail in self._job_store.results(job_id):
+                    if not ok:
+                        failed_groups.append(detail)
+                        continue
+                    processed_members = self._read_spool(os.path.join(spool_dir, f"{group_id}.json.gz"))
+                    sheet_name = f"G{group_id}"[:30]  # 限制sheet名长度
+                    writer.write_group(sheet_name, processed_members)
+                    total_members += len(processed_members)
+                    # 每写完一个群让出事件循环，避免汇总大量群时阻塞加群审核等事件
+                    await asyncio.sleep(0)
+                await asyncio.to_thread(writer.close)
+
+            # 上传结果文件
+            if normalized:
+                file_name = (f"所有群成员数据_规范化_{len(group_list)}群_{writer.unique_users}用户"
+                             f"_{total_members}条成员关系{writer.FORMATS[export_format]}")
+            else:
+                file_name = f"所有群成员数据_{len(group_list)}群_{total_members}人{writer.FORMATS[export_format]}"
+
+            with self._export_stage("upload"):
+                upload_success = await self._upload_file(
+                    event,
+                    writer.path,
+                    file_name,
+                    is_group=event.message_obj.type == MessageType.GROUP_MESSAGE
+                )
+        finally:
+            writer.discard()
+
+        # 上传失败时保留检查点，恢复任务后直接重新汇总上传
+        if not upload_success:
+            raise RuntimeError("文件上传失败")
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+        # 生成报告
+        report = f"全部导出完成！共 {total_members} 名成员\n"
+        if normalized:
+            report = f"全部导出完成！共 {writer.unique_users} 名用户，{total_members} 条成员关系\n"
+        if failed_groups:
+            report += f"⚠️ 有 {len(failed_groups)} 个群处理失败:\n" + "\n".join(failed_groups[:5])
+            if len(failed_groups) > 5:
+                report += f"\n...还有 {len(failed_groups)-5} 个失败项"
+        return report
+
+    # ------------------------------
+    # 后台任务管理
+    # ------------------------------
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("任务列表")
+    async def list_jobs(self, event: AiocqhttpMessageEvent):
+        """列出最近的后台任务"""
+        jobs = self._job_store.recent(10)
+        if not jobs:
+            yield event.plain_result("暂无后台任务")
+            return
+        yield event.plain_result("最近的后台任务：\n" + "\n".join(self._format_job(job) for job in jobs))
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("任务状态")
+    async def job_status(self, event: AiocqhttpMessageEvent):
+        """查看后台任务进度"""
+        job = self._find_job(event.get_plaintext())
+        if not job:
+            yield event.plain_result("未找到该任务，格式：任务状态 任务ID（可用「任务列表」查看）")
+            return
+
+        status = self._format_job(job)
+        if job["message"]:
+            status += f"\n{job['message']}"
+        yield event.plain_result(status)
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("取消任务")
+    async def cancel_job(self, event: AiocqhttpMessageEvent):
+        """取消排队中、进行中或已中断的后台任务"""
+        job = self._find_job(event.get_plaintext())
+        if not job:
+            yield event.plain_result("未找到该任务，格式：取消任务 任务ID")
+            return
+        if job["status"] not in JobStore.ACTIVE + ("interrupted", "failed"):
+            yield event.plain_result(f"任务 {job['job_id']} {_JOB_STATUS_NAMES[job['status']]}，无需取消")
+            return
+
+        job_id = job["job_id"]
+        self._job_store.set_status(job_id, "cancelled")
+        task = self._job_tasks.get(job_id)
+        if task and not task.done():
+            self._cancelled_jobs.add(job_id)
+            task.cancel()
+        else:
+            shutil.rmtree(self._job_spool_dir(job_id), ignore_errors=True)
+        yield event.plain_result(f"任务 {job_id} 已取消")
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("恢复任务")
+    async def resume_job(self, event: AiocqhttpMessageEvent):
+        """从检查点继续已中断或失败的后台任务"""
+        job = self._find_job(event.get_plaintext())
+        if not job:
+            yield event.plain_result("未找到该任务，格式：恢复任务 任务ID")
+            return
+        if job["status"] not in ("interrupted", "failed"):
+            yield event.plain_result(f"任务 {job['job_id']} {_JOB_STATUS_NAMES[job['status']]}，无法恢复")
+            return
+
+        active = self._job_store.active(job["kind"])
+        if active:
+            yield event.plain_result(f"已有{_JOB_KIND_NAMES[job['kind']]}任务 {active['job_id']} 在执行，请稍后再恢复")
+            return
+
+        self._job_store.set_status(job["job_id"], "queued")
+        self._launch_job(job["job_id"], event)
+        done, failed = self._job_store.progress(job["job_id"])
+        retry = f"，失败的 {failed} 个群将重新处理" if failed else ""
+        yield event.plain_result(f"任务 {job['job_id']} 已恢复，已完成的 {done - failed} 个群将被跳过{retry}")
+
+    def _start_job(self, event: AiocqhttpMessageEvent, kind: str, params: Dict[str, Any]) -> str:
+        """创建并启动后台任务；同类任务已在执行时不重复创建"""
+        active = self._job_store.active(kind)
+        if active:
+            return (f"已有{_JOB_KIND_NAMES[kind]}任务 {active['job_id']} {_JOB_STATUS_NAMES[active['status']]}，"
+                    f"可用「任务状态 {active['job_id']}」查看进度")
+
+        for job_id in self._job_store.prune(self.JOB_HISTORY):
+            shutil.rmtree(self._job_spool_dir(job_id), ignore_errors=True)
+        job_id = self._job_store.create(kind, params)
+        self._launch_job(job_id, event)
+        return (f"已创建后台任务 {job_id}（{_JOB_KIND_NAMES[kind]}），完成后将通知结果\n"
+                f"查看进度：任务状态 {job_id}；取消：取消任务 {job_id}")
+
+    def _launch_job(self, job_id: str, event: AiocqhttpMessageEvent) -> None:
+        task = self._spawn(self._run_job(job_id, event))
+        self._job_tasks[job_id] = task
+        task.add_done_callback(lambda _: self._job_tasks.pop(job_id, None))
+
+    async def _run_job(self, job_id: str, event: AiocqhttpMessageEvent) -> None:
+        """执行后台任务，同时运行的任务数受 JOB_MAX_HEAVY 限制"""
+        if self._job_semaphore is None:
+            self._job_semaphore = asyncio.Semaphore(self.JOB_MAX_HEAVY)
+
+        try:
+            async with self._job_semaphore:
+                job = self._job_store.get(job_id)
+                if job is None or job["status"] != "queued":
+                    return
+                self._job_store.set_status(job_id, "running")
+                runner = self._run_export_job if job["kind"] == "export" else self._run_sync_job
+                report = await runner(job_id, job["params"], event)
+
+            self._job_store.set_status(job_id, "done", report)
+            await event.send(event.plain_result(f"任务 {job_id} 已完成\n{report}"))
+
+        except asyncio.CancelledError:
+            # 插件卸载导致的取消不修改状态，下次启动时标记为已中断
+            if job_id in self._cancelled_jobs:
+                self._cancelled_jobs.discard(job_id)
+                shutil.rmtree(self._job_spool_dir(job_id), ignore_errors=True)
+            raise
+        except Exception as e:
+            logger.error(f"后台任务 {job_id} 失败: {str(e)}", exc_info=True)
+            self._job_store.set_status(job_id, "failed", f"失败原因: {str(e)}")
+            await event.send(event.plain_result(f"任务 {job_id} 失败: {str(e)}，可用「恢复任务 {job_id}」从检查点继续"))
+
+    def _find_job(self, text: str) -> Optional[Dict[str, Any]]:
+        match = re.search(r'(?<![0-9a-f])([0-9a-f]{8})(?![0-9a-f])', text.lower())
+        return self._job_store.get(match.group(1)) if match else None
+
+    def _format_job(self, job: Dict[str, Any]) -> str:
+        done, failed = self._job_store.progress(job["job_id"])
+        created = datetime.fromtimestamp(job["created_at"]).strftime("%m-%d %H:%M")
+        total = job["total"] or "?"
+        return (f"{job['job_id']} {_JOB_KIND_NAMES.get(job['kind'], job['kind'])} "
+                f"{_JOB_STATUS_NAMES.get(job['status'], job['status'])} {done}/{total}"
+                + (f" 失败{failed}" if failed else "") + f" {created}")
+
+    def _job_spool_dir(self, job_id: str) -> str:
+        return os.path.join(self.DATA_DIR, "jobs", job_id)
+
+    @staticmethod
+    def _write_spool(path: str, rows: List[Dict[str, Any]]) -> None:
+        """写入单个群的检查点数据，先写临时文件再替换，避免中断时留下残缺文件"""
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=1) as f:
+            json.dump(rows, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read_spool(path: str) -> List[Dict[str, Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+
+    # ------------------------------
+    # 群列表与成员缓存
+    # ------------------------------
+    @filter.event(AiocqhttpNoticeEvent)
+    @filter.func(lambda e: e.event_data.get('notice_type') in ('group_increase', 'group_decrease', 'group_card'))
+    async def handle_group_member_notice(self, event: AiocqhttpNoticeEvent):
+        """根据群成员变动通知更新缓存"""
+        data = event.event_data
+        self._accounts.register(event.bot, data.get('self_id'))
+        notice_type = data['notice_type']
+        group_id = str(data['group_id'])
+        user_id = str(data['user_id'])
+        is_self = user_id == str(data.get('self_id', ''))
+        if not is_self and not self._accounts.is_primary(group_id, data.get('self_id')):
+            return
+        groups = self._group_list_cache.get("groups")
+
+        if notice_type == 'group_card':
+            for member in self._member_cache.get(group_id) or []:
+                if str(member.get("user_id")) == user_id:
+                    member["card"] = data.get('card_new', '')
+                    break
+            self._member_index.update_card(group_id, user_id, data.get('card_new', ''))
+        elif is_self:
+            # 机器人自身入群或退群，群列表已变化
+            self._group_list_cache.pop("groups")
+            self._member_cache.pop(group_id)
+            if notice_type == 'group_decrease':
+                self._member_index.remove_group(group_id)
+        elif notice_type == 'group_decrease':
+            members = self._member_cache.get(group_id)
+            if members is not None:
+                members[:] = [m for m in members if str(m.get("user_id")) != user_id]
+            self._member_index.remove_member(group_id, user_id)
+            self._adjust_member_count(groups, group_id, -1)
+        else:
+            # 新成员的完整资料需重新获取，仅使该群成员缓存失效
+            self._member_cache.pop(group_id)
+            self._adjust_member_count(groups, group_id, 1)
+
+    @staticmethod
+    def _adjust_member_count(groups: Optional[List[Dict[str, Any]]], group_id: str, delta: int) -> None:
+        """同步调整缓存群列表中的成员数"""
+        for group in groups or []:
+            if str(group.get("group_id")) == group_id and isinstance(group.get("member_count"), int):
+                group["member_count"] += delta
+                break
+
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("缓存状态")
+    async def cache_status(self, event: AiocqhttpMessageEvent):
+        """查看群列表与成员缓存命中情况，带"刷新"参数时清空缓存"""
+        if "刷新" in event.get_plaintext():
+            self._group_list_cache.pop("groups")
+            self._member_cache = TTLCache(self.MEMBER_CACHE_SIZE)
+            yield event.plain_result("缓存已清空")
+            return
+
+        lines = []
+        for name, label in (("group_list", "群列表"), ("members", "成员列表")):
+            hits, misses = self._cache_stats[name]
+            total = hits + misses
+            ratio = f"{hits / total:.1%}" if total else "-"
+            lines.append(f"{label}：命中 {hits} 次，未命中 {misses} 次，命中率 {ratio}")
+        lines.append(f"已缓存成员列表的群：{len(self._member_cache)} 个")
+        yield event.plain_result("\n".join(lines))
 
-            # 获取群成员列表
-            members = await client.get_group_member_list(group_id=int(group_id), no_cache=True)
-            if not isinstance(members, list):
-                yield event.plain_result("获取群成员数据失败")
-                return
+    # ------------------------------
+    # 跨群成员查询
+    # ------------------------------
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("查询成员所在群", aliases=["成员所在群"])
+    async def find_member_groups(self, event: AiocqhttpMessageEvent):
+        """根据QQ号查询其所在的群（基于本地成员索引）"""
+        match = re.search(r'(\d{5,})', event.get_plaintext())
+        if not match:
+            yield event.plain_result("请指定QQ号，格式：查询成员所在群 123456789")
+            return
 
-            # 处理并生成Excel
-            processed_members = self._process_members(members)
-            file_content = self._generate_excel_file(processed_members, f"Group_{group_id}")
-            file_name = f"群{group_id}_成员数据_{len(processed_members)}人.xlsx"
-            
-            # 上传文件
-            result = await self._upload_file(
-                event, 
-                file_content, 
-                file_name,
-                is_group=event.message_obj.type == MessageType.GROUP_MESSAGE
-            )
-            
-            if result:
-                yield event.plain_result(f"群成员数据导出成功，共 {len(processed_members)} 人")
-            else:
-                yield event.plain_result("文件上传失败，请稍后重试")
+        user_id = match.group(1)
+        rows = self._member_index.groups_of_user(user_id)
+        if not rows:
+            yield event.plain_result(f"索引中未找到 {user_id}，可先执行获取所有群成员或导出所有群数据更新索引")
+            return
 
-        except Exception as e:
-            logger.error(f"导出群数据错误: {str(e)}", exc_info=True)
-            yield event.plain_result(f"操作失败: {str(e)}")
+        lines = [f"{user_id} 在 {len(rows)} 个群中："]
+        for group_id, group_name, nickname, card in rows:
+            lines.append(f"{group_name or '群' + group_id}({group_id}) {card or nickname}")
+        yield event.plain_result("\n".join(lines))
 
     @filter.permission_type(PermissionType.ADMIN)
-    @filter.command("导出所有群数据")
-    async def export_all_groups_data(self, event: AiocqhttpMessageEvent):
-        """导出机器人加入的所有群成员信息"""
-        try:
-            client = event.bot
-            group_list = await client.get_group_list(no_cache=True)
-            if not group_list:
-                yield event.plain_result("机器人未加入任何群组")
-                return
-
-            yield event.plain_result(f"发现 {len(group_list)} 个群组，开始导出数据...")
-            
-            # 生成多sheet Excel
-            output_buffer = BytesIO()
-            total_members = 0
-            failed_groups = []
-            
-            with pd.ExcelWriter(output_buffer, engine="openpyxl") as writer:
-                for idx, group in enumerate(group_list, 1):
-                    group_id = group["group_id"]
-                    group_name = self._clean_excel_invalid_chars(group["group_name"])
-                    
-                    try:
-                        # 实时反馈进度
-                        if idx % 5 == 0:  # 每处理5个群反馈一次
-                            yield event.plain_result(f"已处理 {idx}/{len(group_list)} 个群...")
-                            
-                        members = await client.get_group_member_list(group_id=group_id, no_cache=True)
-                        if not isinstance(members, list):
-                            failed_groups.append(f"{group_name}({group_id}): 成员数据无效")
-                            continue
-                            
-                        processed_members = self._process_members(members)
-                        for member in processed_members:
-                            member["group_name"] = group_name
-                            
-                        df = pd.DataFrame(processed_members)
-                        sheet_name = f"G{group_id}"[:30]  # 限制sheet名长度
-                        df.to_excel(writer, index=False, sheet_name=sheet_name)
-                        total_members += len(processed_members)
-                        
-                    except Exception as e:
-                        failed_groups.append(f"{group_name}({group_id}): {str(e)[:30]}")
-                        logger.warning(f"处理群 {group_id} 失败: {str(e)}")
+    @filter.command("搜索群成员")
+    async def search_members(self, event: AiocqhttpMessageEvent):
+        """按昵称或群名片检索成员（基于本地成员索引）"""
+        keyword = re.sub(r'^\S*搜索群成员\s*', '', event.get_plaintext().strip())
+        if not keyword:
+            yield event.plain_result("请指定关键字，格式：搜索群成员 昵称或名片")
+            return
 
-            # 上传结果文件
-            output_buffer.seek(0)
-            file_content = output_buffer.getvalue()
-            file_name = f"所有群成员数据_{len(group_list)}群_{total_members}人.xlsx"
-            
-            upload_success = await self._upload_file(
-                event, 
-                file_content, 
-                file_name,
-                is_group=event.message_obj.type == MessageType.GROUP_MESSAGE
-            )
-            
-            # 生成报告
-            report = f"全部导出完成！共 {total_members} 名成员\n"
-            if failed_groups:
-                report += f"⚠️ 有 {len(failed_groups)} 个群处理失败:\n" + "\n".join(failed_groups[:5])
-                if len(failed_groups) > 5:
-                    report += f"\n...还有 {len(failed_groups)-5} 个失败项"
-            
-            yield event.plain_result(report)
+        rows = self._member_index.search(keyword, self.MEMBER_SEARCH_LIMIT)
+        if not rows:
+            yield event.plain_result(f"未找到昵称或名片包含「{keyword}」的成员")
+            return
 
-        except Exception as e:
-            logger.error(f"导出所有群数据错误: {str(e)}", exc_info=True)
-            yield event.plain_result(f"操作失败: {str(e)}")
+        lines = [f"找到 {len(rows)} 条结果（最多显示 {self.MEMBER_SEARCH_LIMIT} 条）："]
+        for user_id, nickname, card, group_id, group_name in rows:
+            lines.append(f"{user_id} {nickname}" + (f"[{card}]" if card else "") + f" - {group_name or group_id}")
+        yield event.plain_result("\n".join(lines))
 
     # ------------------------------
     # 加群请求处理功能
     # ------------------------------
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("验证状态")
+    async def verify_status(self, event: AiocqhttpMessageEvent):
+        """查看卡密验证系统状态"""
+        breaker = self._verify_breaker
+        transitions = "、".join(f"{k} {v}次" for k, v in breaker.transitions.items()) or "无"
+        yield event.plain_result(
+            f"熔断器状态：{breaker.state}\n"
+            f"状态变更：{transitions}\n"
+            f"暂存请求：{len(self._deferred_requests)}/{self.DEFERRED_QUEUE_SIZE}\n"
+            f"验证缓存：{len(self._key_cache)} 条\n"
+            f"批量接口：{'可用' if self._bulk_verify_supported else '不可用，使用单条验证'}"
+        )
+
     @filter.event(AiocqhttpRequestEvent)
     @filter.func(lambda e: e.event_data.get('request_type') == 'group' and e.event_data.get('sub_type') == 'add')
     async def handle_join_group_request(self, event: AiocqhttpRequestEvent):
         """处理加群请求并验证卡密"""
         data = event.event_data
+        self._accounts.register(event.bot, data.get('self_id'))
         group_id = str(data['group_id'])
         user_qq = str(data['user_id'])
         comment = data.get('comment', '')
         flag = data['flag']
+        if flag in self._seen_join_flags:
+            logger.info(f"加群请求已由其他账号受理，跳过 - 群{group_id} 用户{user_qq}")
+            return
+        self._seen_join_flags.set(flag, True, self.KEY_CLAIM_TTL)
         
         # 提取卡密（12位字母数字组合）
         key = self._extract_activation_key(comment)
         logger.info(f"加群请求 - 群{group_id} 用户{user_qq} 卡密:{key} 备注:{comment}")
 
-        # 卡密验证
+        self._ensure_metrics_worker()
+        with self._metrics.timer("shenhe_join_request_seconds"):
+            await self._process_join_request(event.bot, group_id, user_qq, key, flag)
+
+    async def _process_join_request(self, bot, group_id: str, user_qq: str, key: str, flag: str) -> bool:
+        """验证卡密并处理加群请求，验证系统不可用时暂存请求，返回是否已作出决定"""
+        decided = await self._decide_join_request(bot, group_id, user_qq, key, flag)
+        if decided:
+            self._deferred_since.pop(flag, None)
+        return decided
+
+    async def _decide_join_request(self, bot, group_id: str, user_qq: str, key: str, flag: str) -> bool:
+        """执行一次卡密验证与审批"""
         try:
-            # 调用API验证卡密
-            verify_url = f"{self.API_BASE_URL}check_key.php?group_id={group_id}&key={key}"
-            response = self.api_session.get(verify_url, timeout=self.API_TIMEOUT)
-            response.raise_for_status()
-            result = response.json()
+            # 未提供卡密或格式不符，直接本地拒绝
+            if not key:
+                await self._set_group_add_request(
+                    bot,
+                    flag=flag,
+                    sub_type='add',
+                    approve=False,
+                    reason="请在验证信息中填写12位卡密"
+                )
+                logger.warning(f"卡密格式无效 - 群{group_id} 用户{user_qq}")
+                return True
+
+            # 优先使用缓存结果，否则提交到验证队列合批验证
+            result = await self._check_key(group_id, key)
             
-            if result.get('status') == 'success' and result.get('usable') == 1:
-                # 验证通过，同意入群
-                await event.bot.set_group_add_request(flag=flag, sub_type='add', approve=True)
+            if self._is_key_usable(result):
+                claimed = self._claim_key(group_id, key, flag, user_qq)
+                if claimed is None:
+                    # 同一请求经其他账号重复上报，或同一用户已通过，不再重复审批
+                    logger.info(f"卡密已由同一申请占用，跳过 - 群{group_id} 用户{user_qq}")
+                    return True
+                if not claimed:
+                    result = {'status': 'error', 'message': '卡密已被使用'}
+
+            if self._is_key_usable(result):
+                # 验证通过，同意入群；同意失败时释放本地占用，允许重新申请
+                try:
+                    await self._set_group_add_request(bot, flag=flag, sub_type='add', approve=True)
+                except Exception:
+                    self._claimed_keys.pop((group_id, key))
+                    raise
                 logger.info(f"卡密验证通过 - 群{group_id} 用户{user_qq}")
                 
                 # 标记卡密已使用
@@ -227,18 +1802,23 @@ class GroupInformationPlugin(Star):
             else:
                 # 验证失败，拒绝入群
                 reason = result.get('message', '卡密无效')
-                await event.bot.set_group_add_request(
+                await self._set_group_add_request(
+                    bot,
                     flag=flag, 
                     sub_type='add', 
                     approve=False,
                     reason=reason if len(reason) <= 30 else "卡密验证失败"
                 )
                 logger.warning(f"卡密验证失败 - 群{group_id} 用户{user_qq} 原因:{reason}")
+            return True
                 
-        except requests.exceptions.RequestException as e:
-            # API请求异常
-            logger.error(f"卡密验证API错误: {str(e)}")
-            await event.bot.set_group_add_request(
+        except (CircuitOpenError, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            # 验证系统不可用（含返回非JSON的维护页面），暂存请求等待恢复后重新验证
+            logger.error(f"卡密验证API错误: {str(e) or type(e).__name__}")
+            if self._defer_join_request((bot, group_id, user_qq, key, flag)):
+                return False
+            await self._set_group_add_request(
+                bot,
                 flag=flag, 
                 sub_type='add', 
                 approve=False,
@@ -246,6 +1826,205 @@ class GroupInformationPlugin(Star):
             )
         except Exception as e:
             logger.error(f"处理加群请求错误: {str(e)}", exc_info=True)
+        return True
+
+    async def _set_group_add_request(self, bot, **params) -> None:
+        """处理加群请求（同意或拒绝），记录调用耗时"""
+        with self._onebot_timer("set_group_add_request"):
+            await bot.set_group_add_request(**params)
+
+    def _defer_join_request(self, request: tuple) -> bool:
+        """暂存加群请求，队列已满时返回False"""
+        if len(self._deferred_requests) >= self.DEFERRED_QUEUE_SIZE:
+            return False
+        enqueued_at = self._deferred_since.setdefault(request[4], time.monotonic())
+        self._deferred_requests.append((enqueued_at, request))
+        logger.info(f"加群请求已暂存 - 群{request[1]} 用户{request[2]}，当前暂存 {len(self._deferred_requests)} 条")
+        if self._deferred_worker is None or self._deferred_worker.done():
+            self._deferred_worker = asyncio.create_task(self._deferred_loop())
+        return True
+
+    async def _deferred_loop(self) -> None:
+        """等待验证系统恢复：先用一条请求探测，成功后重新验证全部暂存请求"""
+        while self._deferred_requests:
+            await asyncio.sleep(self.DEFERRED_RETRY_INTERVAL)
+
+            # 超时未处理的请求直接拒绝
+            now = time.monotonic()
+            while self._deferred_requests and now - self._deferred_requests[0][0] > self.DEFERRED_MAX_AGE:
+                _, (bot, group_id, user_qq, _, flag) = self._deferred_requests.popleft()
+                self._deferred_since.pop(flag, None)
+                logger.warning(f"暂存加群请求超时 - 群{group_id} 用户{user_qq}")
+                try:
+                    await self._set_group_add_request(
+                        bot, flag=flag, sub_type='add', approve=False, reason="验证系统维护中，请稍后再试"
+                    )
+                except Exception as e:
+                    logger.error(f"拒绝超时加群请求失败: {str(e)}")
+
+            if not self._deferred_requests or not self._verify_breaker.probe_ready():
+                continue
+
+            _, probe = self._deferred_requests.popleft()
+            if not await self._process_join_request(*probe):
+                continue
+
+            pending = [request for _, request in self._deferred_requests]
+            self._deferred_requests.clear()
+            logger.info(f"验证系统已恢复，重新验证 {len(pending)} 条暂存请求")
+            await asyncio.gather(*(self._process_join_request(*request) for request in pending))
+
+    @staticmethod
+    def _is_key_usable(result: Any) -> bool:
+        """判断验证结果是否为可用卡密"""
+        return isinstance(result, dict) and result.get('status') == 'success' and result.get('usable') == 1
+
+    async def _check_key(self, group_id: str, key: str) -> Dict[str, Any]:
+        """验证卡密，命中缓存时直接返回，相同卡密的并发验证共享同一请求"""
+        cache_key = (group_id, key)
+        cached = self._key_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        task = self._key_inflight.get(cache_key)
+        if task is None:
+            task = asyncio.create_task(self._verify_key(group_id, key))
+            self._key_inflight[cache_key] = task
+            task.add_done_callback(lambda t: self._on_key_verified(cache_key, t))
+        return await asyncio.shield(task)
+
+    def _on_key_verified(self, cache_key: tuple, task: asyncio.Task) -> None:
+        """验证完成后写入缓存，已被占用的卡密不再缓存为有效
+
+        只缓存接口明确给出的结论，服务端临时错误（如"系统繁忙"）不缓存
+        """
+        self._key_inflight.pop(cache_key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        result = task.result()
+        if self._is_key_usable(result):
+            if cache_key not in self._claimed_keys:
+                self._key_cache.set(cache_key, result, self.KEY_CACHE_TTL_VALID)
+        elif isinstance(result, dict) and result.get('status') == 'success':
+            self._key_cache.set(cache_key, result, self.KEY_CACHE_TTL_INVALID)
+
+    def _claim_key(self, group_id: str, key: str, flag: str, user_qq: str) -> Optional[bool]:
+        """在本地占用卡密，确保同一卡密只会通过一次
+
+        记录占用者的请求flag与QQ号：占用成功返回True，已被他人占用返回False，
+        同一请求或同一用户重复占用时返回None
+        """
+        cache_key = (group_id, key)
+        claimant = self._claimed_keys.get(cache_key)
+        if claimant is not None:
+            claimed_flag, claimed_user = claimant
+            return None if flag == claimed_flag or user_qq == claimed_user else False
+        self._claimed_keys.set(cache_key, (flag, user_qq), self.KEY_CLAIM_TTL)
+        self._key_cache.pop(cache_key)
+        return True
+
+    async def _verify_key(self, group_id: str, key: str) -> Dict[str, Any]:
+        """提交卡密到验证队列并等待验证结果"""
+        if self._verify_worker is None or self._verify_worker.done():
+            self._verify_queue = self._verify_queue or asyncio.Queue()
+            self._verify_semaphore = asyncio.Semaphore(self.VERIFY_MAX_INFLIGHT)
+            self._verify_worker = asyncio.create_task(self._verify_loop())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._verify_queue.put((group_id, key, future))
+        return await future
+
+    async def _verify_loop(self) -> None:
+        """按时间窗口和批大小收集验证请求，分发给批量验证任务"""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._verify_queue.get()]
+            deadline = loop.time() + self.VERIFY_BATCH_WINDOW
+            while len(batch) < self.VERIFY_BATCH_SIZE:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._verify_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            self._spawn(self._run_verify_batch(batch))
+
+    async def _run_verify_batch(self, batch: List[tuple]) -> None:
+        """执行一批验证：优先批量接口，不支持时并发单条验证"""
+        items = [(group_id, key) for group_id, key, _ in batch]
+        try:
+            results = None
+            if self._bulk_verify_supported and len(items) > 1:
+                async with self._verify_semaphore:
+                    results = await self._call_with_breaker(self._verify_bulk(items))
+            if results is None:
+                results = await asyncio.gather(
+                    *(self._verify_single(group_id, key) for group_id, key in items),
+                    return_exceptions=True
+                )
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def _verify_single(self, group_id: str, key: str) -> Dict[str, Any]:
+        """调用单条卡密验证接口"""
+        async with self._verify_semaphore:
+            return await self._call_with_breaker(self._api_request(
+                "GET", "check_key.php", params={"group_id": group_id, "key": key}
+            ))
+
+    async def _call_with_breaker(self, coro) -> Any:
+        """经熔断器执行验证请求，熔断期间直接失败"""
+        if not self._verify_breaker.allow_request():
+            coro.close()
+            raise CircuitOpenError("验证接口熔断中")
+        try:
+            result = await coro
+        except aiohttp.ClientResponseError as e:
+            # 4xx（429除外）说明服务可达，不计入失败
+            if e.status >= 500 or e.status == 429:
+                self._verify_breaker.record_failure()
+            else:
+                self._verify_breaker.record_success()
+            raise
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self._verify_breaker.record_failure()
+            raise
+        except asyncio.CancelledError:
+            self._verify_breaker.release_probe()
+            raise
+        except Exception:
+            # 其他异常（如维护页面返回200+HTML导致JSON解析失败）同样计为失败，避免半开探测一直占用
+            self._verify_breaker.record_failure()
+            raise
+        self._verify_breaker.record_success()
+        return result
+
+    async def _verify_bulk(self, items: List[tuple]) -> Optional[List[Dict[str, Any]]]:
+        """调用批量验证接口，接口不存在或返回格式不符时返回None"""
+        payload = {"items": [{"group_id": group_id, "key": key} for group_id, key in items]}
+        try:
+            result = await self._api_request("POST", self.VERIFY_BULK_ENDPOINT, json=payload)
+        except aiohttp.ClientResponseError as e:
+            if e.status in (404, 405, 501):
+                logger.info("批量验证接口不可用，降级为单条并发验证")
+                self._bulk_verify_supported = False
+                return None
+            raise
+
+        results = result.get("results") if isinstance(result, dict) else None
+        if not isinstance(results, list) or len(results) != len(items):
+            logger.warning("批量验证接口返回格式异常，本批改为单条验证")
+            return None
+        return results
 
     # ------------------------------
     # 群成员推送功能
@@ -269,166 +2048,458 @@ class GroupInformationPlugin(Star):
         yield event.plain_result(f"开始获取群 {group_id} 的成员信息...")
         
         # 获取并推送成员数据
-        members, error = await self.fetch_group_members(event.bot, group_id)
+        members, error = await self.fetch_group_members(event.bot, group_id, refresh="刷新" in cmd_text)
         if error:
             yield event.plain_result(f"获取失败：{error}")
             return
 
-        push_result = await self._push_members_to_api(members)
+        push_result = await self._sync_group_members(group_id, members, full=True)
         yield event.plain_result(push_result)
 
     @filter.permission_type(PermissionType.ADMIN)
     @filter.command("获取所有群成员", aliases=["全量更新群成员"])
     async def get_all_group_members(self, event: AiocqhttpMessageEvent):
-        """获取所有群成员并批量推送至API"""
+        """获取所有群成员并批量推送至API（后台任务）"""
         if not self._is_admin(event.get_sender_id()):
             yield event.plain_result("权限不足：仅管理员可执行此操作")
             return
 
-        try:
-            client = event.bot
-            group_list = await client.get_group_list(no_cache=True)
-            if not group_list:
-                yield event.plain_result("机器人未加入任何群组")
-                return
+        text = event.get_plaintext()
+        params = {"full_sync": not self.DELTA_SYNC or "全量" in text, "refresh": "刷新" in text}
+        yield event.plain_result(self._start_job(event, "sync", params))
 
-            total_groups = len(group_list)
-            success_count = 0
-            failed_groups = []
-            
-            yield event.plain_result(f"发现 {total_groups} 个群，开始批量处理...")
+    async def _run_sync_job(self, job_id: str, params: Dict[str, Any], event: AiocqhttpMessageEvent) -> str:
+        """逐群获取并推送成员，每完成一个群记录检查点"""
+        client = event.bot
+        refresh = params["refresh"]
+        full_sync = params["full_sync"]
+        group_list = await self._get_group_list(client, refresh)
+        if not group_list:
+            return "机器人未加入任何群组"
 
-            for i, group in enumerate(group_list, 1):
-                group_id = str(group['group_id'])
-                group_name = group.get('group_name', f"群{group_id}")
-                
-                # 进度反馈
-                if i % 3 == 0 or i == total_groups:
-                    yield event.plain_result(f"处理进度：{i}/{total_groups}（{group_name}）")
-                
-                # 获取成员
-                members, error = await self.fetch_group_members(client, group_id)
-                if error:
-                    failed_groups.append(f"{group_name}：{error}")
+        total_groups = len(group_list)
+        self._job_store.set_total(job_id, total_groups)
+        # 只跳过已成功的群，失败的群恢复任务时重新处理并覆盖原检查点
+        done = {group_id for group_id, ok, _ in self._job_store.results(job_id) if ok}
+        pending = [group for group in group_list if str(group["group_id"]) not in done]
+        positions = {str(group["group_id"]): idx for idx, group in enumerate(group_list)}
+        resumed = f"，从检查点继续，剩余 {len(pending)} 个" if done else ""
+        await event.send(event.plain_result(
+            f"任务 {job_id}：发现 {total_groups} 个群{resumed}，开始{'全量' if full_sync else '增量'}批量处理..."
+        ))
+
+        async def sync(group: Dict[str, Any]) -> str:
+            # 获取成员
+            members, error = await self.fetch_group_members(client, str(group['group_id']), refresh, cache=False)
+            if error:
+                raise RuntimeError(error)
+
+            # 推送数据
+            return await self._sync_group_members(str(group['group_id']), members, full=full_sync)
+
+        async for group, push_result, error in self._fetch_groups_concurrently(pending, sync):
+            group_id = str(group['group_id'])
+            group_name = group.get('group_name', f"群{group_id}")
+
+            if error is not None:
+                self._job_store.checkpoint(job_id, group_id, positions[group_id], False, f"{group_name}：{error}")
+            else:
+                ok = "成功" in push_result
+                self._job_store.checkpoint(
+                    job_id, group_id, positions[group_id], ok, "" if ok else f"{group_name}：{push_result}"
+                )
+
+        # 生成报告
+        results = self._job_store.results(job_id)
+        success_count = sum(1 for _, ok, _ in results if ok)
+        failed_groups = [detail for _, ok, detail in results if not ok]
+        report = f"批量处理完成！\n成功：{success_count} 个群\n失败：{len(failed_groups)} 个群"
+        if failed_groups:
+            report += "\n失败详情：\n" + "\n".join(failed_groups[:5])
+            if len(failed_groups) > 5:
+                report += f"\n...及其他 {len(failed_groups)-5} 项"
+        return report
+
+    # ------------------------------
+    # 定时错峰同步
+    # ------------------------------
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("同步计划")
+    async def sync_schedule_status(self, event: AiocqhttpMessageEvent):
+        """查看定时同步的进度与节奏"""
+        if not self.SYNC_SCHEDULE:
+            yield event.plain_result("定时同步未启用")
+            return
+
+        groups = self._group_list_cache.get("groups") or []
+        state = self._member_snapshots.sync_state()
+        now = time.time()
+        fresh = sum(1 for group in groups if now - state.get(str(group["group_id"]), (0, 0))[0] < self.SYNC_WINDOW)
+        lines = [
+            f"同步窗口：{self.SYNC_WINDOW / 3600:g} 小时，窗口内已同步 {fresh}/{len(groups)} 个群",
+            f"当前间隔放大倍数：{self._sync_backoff}"
+        ]
+        if self._sync_next:
+            group_id, at = self._sync_next
+            lines.append(f"下一个：群 {group_id}，约 {max(int(at - now), 0)} 秒后")
+        yield event.plain_result("\n".join(lines))
+
+    def _ensure_sync_scheduler(self) -> None:
+        """启动定时同步任务"""
+        if self.SYNC_SCHEDULE and (self._sync_scheduler is None or self._sync_scheduler.done()):
+            self._sync_scheduler = asyncio.create_task(self._sync_scheduler_loop())
+
+    def _sync_priority(self, group: Dict[str, Any], change_rate: float) -> float:
+        """同步优先级：1 为每个窗口同步一次，大群和变化频繁的群最高可达 SYNC_MAX_PRIORITY"""
+        size_score = min(group.get("member_count", 0) / self.SYNC_LARGE_GROUP, 1)
+        change_score = min(change_rate / self.SYNC_HIGH_CHANGE_RATE, 1)
+        return 1 + (self.SYNC_MAX_PRIORITY - 1) * max(size_score, change_score)
+
+    def _plan_sync(self, groups: List[Dict[str, Any]]) -> tuple:
+        """选出最该同步的群，并按总同步量把窗口均分为固定间隔，返回 (群信息或None, 间隔秒数)"""
+        state = self._member_snapshots.sync_state()
+        now = time.time()
+        best, best_score, total_weight = None, None, 0.0
+        for group in groups:
+            last_synced, change_rate = state.get(str(group["group_id"]), (0.0, 0.0))
+            priority = self._sync_priority(group, change_rate)
+            total_weight += priority
+            # 逾期时长按优先级加权，从未同步过的群以优先级排序
+            overdue = now - (last_synced + self.SYNC_WINDOW / priority) if last_synced else 0.0
+            if overdue < 0:
+                continue
+            score = (overdue * priority, priority)
+            if best_score is None or score > best_score:
+                best, best_score = group, score
+        gap = max(self.SYNC_WINDOW / max(total_weight, 1), self.SYNC_MIN_GAP)
+        return best, gap
+
+    async def _sync_scheduler_loop(self) -> None:
+        """按计划逐群同步成员，负载在时间窗口内保持平稳，连续出错时拉长间隔"""
+        while True:
+            gap = self.SYNC_MIN_GAP
+            try:
+                bot = getattr(self.context, "bot", None)
+                if bot is None or self._job_store.active("sync"):
+                    # 尚未连接或手动同步任务进行中时不重复同步
+                    await asyncio.sleep(60)
+                    continue
+
+                groups = await self._get_group_list(bot)
+                if not isinstance(groups, list) or not groups:
+                    await asyncio.sleep(60)
+                    continue
+
+                group, gap = self._plan_sync(groups)
+                if group is None:
+                    self._sync_next = None
+                    await asyncio.sleep(gap)
                     continue
 
-                # 推送数据
-                push_result = await self._push_members_to_api(members)
-                if "成功" in push_result:
-                    success_count += 1
+                group_id = str(group["group_id"])
+                self._sync_next = (group_id, time.time() + gap * self._sync_backoff)
+                members, error = await self.fetch_group_members(bot, group_id, refresh=True, cache=False)
+                result = error or await self._sync_group_members(group_id, members)
+                if error is None and "成功" in result:
+                    self._sync_backoff = max(self._sync_backoff // 2, 1)
                 else:
-                    failed_groups.append(f"{group_name}：{push_result}")
-                
-                time.sleep(self.REQUEST_DELAY)  # 避免请求过于频繁
-
-            # 生成报告
-            report = f"批量处理完成！\n成功：{success_count} 个群\n失败：{len(failed_groups)} 个群"
-            if failed_groups:
-                report += "\n失败详情：\n" + "\n".join(failed_groups[:5])
-                if len(failed_groups) > 5:
-                    report += f"\n...及其他 {len(failed_groups)-5} 项"
-            
-            yield event.plain_result(report)
-            
-        except Exception as e:
-            logger.error(f"全量更新成员错误: {str(e)}", exc_info=True)
-            yield event.plain_result(f"操作失败: {str(e)}")
+                    self._sync_backoff = min(self._sync_backoff * 2, self.SYNC_BACKOFF_MAX)
+                    logger.warning(f"定时同步群 {group_id} 失败（间隔放大 {self._sync_backoff} 倍）: {result}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._sync_backoff = min(self._sync_backoff * 2, self.SYNC_BACKOFF_MAX)
+                logger.error(f"定时同步出错: {str(e)}", exc_info=True)
+            await asyncio.sleep(gap * self._sync_backoff)
+
+    # ------------------------------
+    # 性能指标
+    # ------------------------------
+    @filter.permission_type(PermissionType.ADMIN)
+    @filter.command("性能指标")
+    async def metrics_status(self, event: AiocqhttpMessageEvent):
+        """查看外部调用耗时、重试次数、导出各阶段耗时与事件循环延迟"""
+        if not self._metrics.enabled:
+            yield event.plain_result("性能指标未启用")
+            return
+
+        metrics = self._metrics
+        # 失败次数包含抛出异常的调用和被重试的429/5xx响应
+        errors: Dict[str, float] = {}
+        for labels, value in metrics.counters("shenhe_external_calls_total").items():
+            labels = dict(labels)
+            if labels["status"] != "ok":
+                errors[labels["call"]] = errors.get(labels["call"], 0) + value
+        lines = ["外部调用（次数 失败 p50 p99 最大）："]
+        for labels, histogram in sorted(metrics.histograms("shenhe_external_call_seconds").items()):
+            call = dict(labels)["call"]
+            lines.append(f"  {call}: {self._format_histogram(histogram, errors.get(call, 0))}")
+
+        retries = metrics.counters("shenhe_api_retries_total")
+        if retries:
+            lines.append("API重试：" + "，".join(f"{dict(l)['endpoint']} {v:g}次" for l, v in sorted(retries.items())))
+
+        for name, label in (("shenhe_join_request_seconds", "加群请求处理"), ("shenhe_event_loop_lag_seconds", "事件循环延迟")):
+            for _, histogram in metrics.histograms(name).items():
+                lines.append(f"{label}：{self._format_histogram(histogram)}")
+
+        stages = metrics.histograms("shenhe_export_stage_seconds")
+        if stages:
+            lines.append("导出各阶段（次数 合计）：" + "，".join(
+                f"{dict(l)['stage']} {sum(h[:-2])}次 {h[-2]:.2f}s" for l, h in sorted(stages.items())
+            ))
+        yield event.plain_result("\n".join(lines))
+
+    def _format_histogram(self, histogram: List[float], errors: Optional[float] = None) -> str:
+        count = sum(histogram[:-2])
+        p50, p99 = (self._metrics.quantile(histogram, q) * 1000 for q in (0.5, 0.99))
+        failed = f" 失败{errors:g}" if errors is not None else ""
+        return f"{count}次{failed} p50≤{p50:.0f}ms p99≤{p99:.0f}ms 最大{histogram[-1] * 1000:.0f}ms"
+
+    def _onebot_timer(self, action: str):
+        """OneBot接口调用计时"""
+        return self._metrics.timer(
+            "shenhe_external_call_seconds", "shenhe_external_calls_total", call=f"onebot:{action}"
+        )
+
+    def _export_stage(self, stage: str):
+        """导出阶段计时"""
+        return self._metrics.timer("shenhe_export_stage_seconds", stage=stage)
+
+    def _metrics_gauges(self) -> Dict[str, float]:
+        """运行状态类指标"""
+        return {
+            "shenhe_group_list_cache_hits": self._cache_stats["group_list"][0],
+            "shenhe_group_list_cache_misses": self._cache_stats["group_list"][1],
+            "shenhe_member_cache_hits": self._cache_stats["members"][0],
+            "shenhe_member_cache_misses": self._cache_stats["members"][1],
+            "shenhe_deferred_join_requests": len(self._deferred_requests),
+            "shenhe_mark_queue_pending": len(self._mark_queue),
+            "shenhe_verify_breaker_open": int(self._verify_breaker.state != CircuitBreaker.CLOSED),
+            "shenhe_api_throttled": self._api_limiter.throttled,
+            "shenhe_sync_backoff": self._sync_backoff
+        }
+
+    def _ensure_metrics_worker(self) -> None:
+        """启动事件循环延迟采样及可选的 /metrics 端点"""
+        if not self._metrics.enabled:
+            return
+        if self._metrics_worker is None or self._metrics_worker.done():
+            self._metrics_worker = asyncio.create_task(self._metrics_loop())
+            if self.METRICS_HTTP_PORT and self._metrics_server is None:
+                self._spawn(self._start_metrics_server())
+
+    async def _metrics_loop(self) -> None:
+        """定时采样事件循环延迟，配置了指标文件时定期写出"""
+        loop = asyncio.get_running_loop()
+        next_write = loop.time()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.METRICS_LAG_INTERVAL)
+            lag = loop.time() - started - self.METRICS_LAG_INTERVAL
+            self._metrics.observe("shenhe_event_loop_lag_seconds", max(lag, 0.0))
+
+            if self.METRICS_FILE and loop.time() >= next_write:
+                next_write = loop.time() + self.METRICS_FILE_INTERVAL
+                try:
+                    tmp_path = self.METRICS_FILE + ".tmp"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        f.write(self._metrics.render_prometheus(self._metrics_gauges()))
+                    os.replace(tmp_path, self.METRICS_FILE)
+                except OSError as e:
+                    logger.warning(f"写出指标文件失败: {str(e)}")
+
+    async def _start_metrics_server(self) -> None:
+        """启动 Prometheus 文本格式的 /metrics 端点"""
+        async def handle_metrics(request: web.Request) -> web.Response:
+            return web.Response(
+                text=self._metrics.render_prometheus(self._metrics_gauges()),
+                content_type="text/plain", charset="utf-8"
+            )
+
+        app = web.Application()
+        app.router.add_get("/metrics", handle_metrics)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, self.METRICS_HTTP_HOST, self.METRICS_HTTP_PORT).start()
+        except OSError as e:
+            await runner.cleanup()
+            logger.error(f"指标端点启动失败: {str(e)}")
+            return
+        self._metrics_server = runner
+        logger.info(f"指标端点已启动: http://{self.METRICS_HTTP_HOST}:{self.METRICS_HTTP_PORT}/metrics")
 
     # ------------------------------
     # 辅助工具函数
     # ------------------------------
+    async def _fetch_groups_concurrently(self, group_list: List[Dict[str, Any]], fetch):
+        """以有限并发对每个群执行fetch，按完成顺序产出 (群信息, 结果, 异常)"""
+        # 固定数量的worker经有界队列交出结果，已消费的群不再被引用，内存只与并发数相关
+        queue: asyncio.Queue = asyncio.Queue(self.FETCH_CONCURRENCY)
+        pending = iter(group_list)
+
+        async def run(group: Dict[str, Any]) -> tuple:
+            try:
+                return group, await fetch(group), None
+            except Exception as e:
+                return group, None, e
+
+        async def worker() -> None:
+            for group in pending:
+                await queue.put(await run(group))
+
+        workers = [asyncio.create_task(worker()) for _ in range(min(self.FETCH_CONCURRENCY, len(group_list)))]
+        try:
+            for _ in range(len(group_list)):
+                yield await queue.get()
+        finally:
+            for task in workers:
+                task.cancel()
+
     def _process_members(self, members: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-        """处理成员数据，格式化字段"""
-        processed = []
-        char_clean_fields = {"nickname", "card", "title"}
-        timestamp_fields = {"join_time", "last_sent_time", "title_expire_time", "shut_up_timestamp"}
+        """处理成员数据，格式化字段（按列批量转换）"""
+        processed = [dict(member) for member in members if isinstance(member, dict)]
 
-        for member in members:
-            if not isinstance(member, dict):
+        for field in _CHAR_CLEAN_FIELDS + _TIMESTAMP_FIELDS:
+            rows = [item for item in processed if field in item]
+            if not rows:
                 continue
-                
-            item = {}
-            for key, value in member.items():
-                if key in char_clean_fields:
-                    item[key] = self._clean_excel_invalid_chars(value)
-                elif key in timestamp_fields:
-                    item[key] = self._format_timestamp(value)
-                else:
-                    item[key] = value
-                    
-            processed.append(item)
+            values = [item[field] for item in rows]
+            if field in _CHAR_CLEAN_FIELDS:
+                converted = self._clean_text_column(values)
+            else:
+                converted = self._format_timestamp_column(values)
+            for item, value in zip(rows, converted):
+                item[field] = value
             
         return processed
 
+    def _clean_text_column(self, values: List[Any]) -> List[Any]:
+        """整列清理特殊字符：拼接为一个字符串后一次性替换再拆分"""
+        strings = [value for value in values if isinstance(value, str)]
+        joined = _COLUMN_SEPARATOR.join(strings)
+        if joined.count(_COLUMN_SEPARATOR) != max(len(strings) - 1, 0):
+            # 文本中本身含有分隔符时逐个清理
+            return [self._clean_excel_invalid_chars(value) for value in values]
+        cleaned = iter(_EXCEL_INVALID_CHARS.sub("", joined).split(_COLUMN_SEPARATOR))
+        return [next(cleaned) if isinstance(value, str) else value for value in values]
+
+    def _format_timestamp_column(self, values: List[Any]) -> List[str]:
+        """整列格式化时间戳，相同取值只格式化一次"""
+        try:
+            keys = [(type(value), value) for value in values]
+            formatted = {key: self._format_timestamp(key[1]) for key in dict.fromkeys(keys)}
+        except TypeError:
+            # 存在不可哈希的取值时逐个格式化
+            return [self._format_timestamp(value) for value in values]
+        return [formatted[key] for key in keys]
+
     @staticmethod
-    def _generate_excel_file(data: List[Dict[str, Any]], sheet_name: str = "Sheet1") -> bytes:
-        """生成Excel文件二进制内容"""
-        df = pd.DataFrame(data)
-        buffer = BytesIO()
-        df.to_excel(buffer, index=False, engine="openpyxl", sheet_name=sheet_name)
-        buffer.seek(0)
-        return buffer.getvalue()
+    def _generate_excel_file(data: List[Dict[str, Any]], sheet_name: str = "Sheet1") -> str:
+        """生成Excel临时文件，返回文件路径，由调用方负责删除"""
+        writer = MemberExportWriter("xlsx")
+        try:
+            writer.write_group(sheet_name, data)
+            writer.close()
+        except Exception:
+            writer.discard()
+            raise
+        return writer.path
 
     async def _upload_file(
         self, 
         event: AiocqhttpMessageEvent, 
-        file_content: bytes, 
+        file_path: str, 
         file_name: str, 
         is_group: bool = True
     ) -> bool:
-        """上传文件到群聊或私聊"""
+        """上传文件到群聊或私聊，大文件以路径或HTTP地址交给协议端读取，避免base64内联"""
+        cleanup = None
         try:
             target_id = event.get_group_id() if is_group else event.get_sender_id()
             if not target_id:
                 return False
-                
-            # 转换为base64格式上传
-            b64_content = base64.b64encode(file_content).decode("utf-8")
+
+            file_uri, cleanup = await self._prepare_upload_uri(file_path)
             
             if is_group:
-                await event.bot.upload_group_file(
-                    group_id=int(target_id),
-                    file=f"base64://{b64_content}",
-                    name=file_name
-                )
+                with self._onebot_timer("upload_group_file"):
+                    await event.bot.upload_group_file(
+                        group_id=int(target_id),
+                        file=file_uri,
+                        name=file_name
+                    )
             else:
-                await event.bot.upload_private_file(
-                    user_id=int(target_id),
-                    file=f"base64://{b64_content}",
-                    name=file_name
-                )
+                with self._onebot_timer("upload_private_file"):
+                    await event.bot.upload_private_file(
+                        user_id=int(target_id),
+                        file=file_uri,
+                        name=file_name
+                    )
             return True
             
         except Exception as e:
             logger.error(f"文件上传失败: {str(e)}")
             return False
+        finally:
+            if cleanup:
+                cleanup()
 
-    async def fetch_group_members(self, bot, group_id: str) -> tuple[List[Dict], Optional[str]]:
-        """分页获取群成员列表"""
-        try:
-            all_members = []
-            next_token = None
+    async def _prepare_upload_uri(self, file_path: str) -> tuple:
+        """按上传模式生成协议端可读取的文件地址，返回 (地址, 上传后的清理函数)"""
+        if self.UPLOAD_MODE == "base64" or os.path.getsize(file_path) <= self.UPLOAD_BASE64_THRESHOLD:
+            # 小文件直接内联
+            with open(file_path, "rb") as f:
+                return f"base64://{base64.b64encode(f.read()).decode('utf-8')}", None
 
-            while True:
-                params = {"group_id": int(group_id)}
-                if next_token:
-                    params["next_token"] = next_token
+        if self.UPLOAD_MODE == "http":
+            # 由插件内置HTTP服务提供一次性下载地址
+            token = secrets.token_urlsafe(16)
+            self._served_files[token] = file_path
+            base_url = await self._ensure_file_server()
+            return f"{base_url}/files/{token}", lambda: self._served_files.pop(token, None)
 
-                result = await bot.get_group_member_list(**params)
-                
-                # 处理分页数据
-                if isinstance(result, dict):
-                    all_members.extend(result.get("data", []))
-                    next_token = result.get("next_token")
-                elif isinstance(result, list):
-                    all_members.extend(result)
-                    next_token = None
-                else:
-                    break
+        if self.UPLOAD_SHARED_DIR:
+            # 复制到与协议端共享的目录，以协议端视角的路径上传
+            os.makedirs(self.UPLOAD_SHARED_DIR, exist_ok=True)
+            shared_name = f"{secrets.token_hex(8)}_{os.path.basename(file_path)}"
+            shared_path = os.path.join(self.UPLOAD_SHARED_DIR, shared_name)
+            await asyncio.to_thread(shutil.copyfile, file_path, shared_path)
+            remote_dir = self.UPLOAD_SHARED_DIR_REMOTE or self.UPLOAD_SHARED_DIR
+            remote_path = f"{remote_dir.rstrip('/')}/{shared_name}"
 
-                if not next_token:
-                    break
-                time.sleep(0.5)  # 分页请求间隔
+            def remove_shared() -> None:
+                if os.path.exists(shared_path):
+                    os.remove(shared_path)
+
+            return f"file://{remote_path}", remove_shared
+
+        return Path(file_path).resolve().as_uri(), None
+
+    async def _ensure_file_server(self) -> str:
+        """启动供协议端下载导出文件的本地HTTP服务"""
+        if self._file_server is None:
+            app = web.Application()
+            app.router.add_get("/files/{token}", self._serve_file)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, self.UPLOAD_HTTP_HOST, self.UPLOAD_HTTP_PORT).start()
+            self._file_server = runner
+        return self.UPLOAD_HTTP_PUBLIC_URL or f"http://{self.UPLOAD_HTTP_HOST}:{self.UPLOAD_HTTP_PORT}"
+
+    async def _serve_file(self, request: web.Request) -> web.StreamResponse:
+        file_path = self._served_files.get(request.match_info["token"])
+        if not file_path or not os.path.exists(file_path):
+            raise web.HTTPNotFound()
+        return web.FileResponse(file_path)
+
+    async def fetch_group_members(
+        self, bot, group_id: str, refresh: bool = False, cache: bool = True
+    ) -> tuple[List[Dict], Optional[str]]:
+        """获取群成员列表并整理为推送格式"""
+        try:
+            all_members = await self._get_group_members_raw(bot, group_id, refresh, cache)
 
             # 格式化成员数据
             formatted = [
@@ -446,37 +2517,218 @@ class GroupInformationPlugin(Star):
         except Exception as e:
             return [], str(e)
 
+    async def _sync_group_members(self, group_id: str, members: List[Dict], full: bool = False) -> str:
+        """同步群成员到API：有快照时只推送新增、退群和资料变更，推送成功后更新快照"""
+        if full or not members or not self._delta_push_supported or not self._member_snapshots.has_group(group_id):
+            push_result = await self._push_members_to_api(members)
+            if "成功" in push_result:
+                self._member_snapshots.replace(group_id, members)
+                self._member_snapshots.record_sync(group_id)
+            return push_result
+
+        upserts, removed = self._member_snapshots.diff(group_id, members)
+        if not upserts and not removed:
+            self._member_snapshots.record_sync(group_id, 0.0)
+            return f"群 {group_id} 成员无变化，同步成功"
+
+        push_result = await self._push_member_delta(group_id, upserts, removed)
+        if push_result is None:
+            # 服务端不支持增量推送，改为全量
+            return await self._sync_group_members(group_id, members, full=True)
+        if "成功" in push_result:
+            self._member_snapshots.replace(group_id, members)
+            self._member_snapshots.record_sync(group_id, (len(upserts) + len(removed)) / len(members))
+        return push_result
+
+    async def _push_member_delta(self, group_id: str, upserts: List[Dict], removed: List[str]) -> Optional[str]:
+        """推送成员增量，增量接口不可用时返回None"""
+        batched = await self._submit_push({
+            "group_id": group_id, "mode": "delta", "members": upserts, "removed": removed
+        })
+        if batched is not None:
+            ok, message = batched
+            return f"群 {group_id} 增量同步成功：新增或变更 {len(upserts)} 人，退群 {len(removed)} 人" if ok else message
+
+        try:
+            payload = {
+                "bot_qq": self._bot_qq(group_id),
+                "group_id": group_id,
+                "members": upserts,
+                "removed": removed
+            }
+            result = await self._api_request("POST", self.DELTA_PUSH_ENDPOINT, json=payload)
+
+            if result.get("status") == "success":
+                return f"群 {group_id} 增量同步成功：新增或变更 {len(upserts)} 人，退群 {len(removed)} 人"
+            else:
+                return f"推送失败: {result.get('message', '未知错误')}"
+
+        except aiohttp.ClientResponseError as e:
+            if e.status in (404, 405, 501):
+                logger.info("增量推送接口不可用，改为全量推送")
+                self._delta_push_supported = False
+                return None
+            return f"API请求失败: {str(e)}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return f"API请求失败: {str(e) or type(e).__name__}"
+        except Exception as e:
+            return f"处理失败: {str(e)}"
+
+    async def _submit_push(self, entry: Dict[str, Any]) -> Optional[tuple]:
+        """提交一个群的推送内容到合并队列，返回 (是否成功, 失败信息)，合并接口不可用时返回None"""
+        if not self._batch_push_supported:
+            return None
+        if self._push_worker is None or self._push_worker.done():
+            self._push_queue = self._push_queue or asyncio.Queue()
+            self._push_semaphore = asyncio.Semaphore(self.PUSH_MAX_INFLIGHT)
+            self._push_worker = asyncio.create_task(self._push_loop())
+
+        loop = asyncio.get_running_loop()
+        bot_qq = self._bot_qq(entry["group_id"])
+        futures = []
+        for part in self._split_push_entry(entry):
+            future = loop.create_future()
+            futures.append(future)
+            await self._push_queue.put((part, future, bot_qq))
+
+        results = await asyncio.gather(*futures)
+        if any(result is None for result in results):
+            return None
+        failures = [message for ok, message in results if not ok]
+        return (not failures, failures[0] if failures else "")
+
+    def _split_push_entry(self, entry: Dict[str, Any]) -> List[bytes]:
+        """序列化推送内容，超过字节上限时按成员拆分为带序号的分片"""
+        encoded = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        members = entry["members"]
+        if len(encoded) <= self.PUSH_BATCH_BYTES or len(members) <= 1:
+            return [encoded]
+
+        chunk_count = min(len(members), math.ceil(len(encoded) / self.PUSH_BATCH_BYTES))
+        chunk_size = math.ceil(len(members) / chunk_count)
+        chunks = [members[i:i + chunk_size] for i in range(0, len(members), chunk_size)]
+        upload_id = uuid.uuid4().hex
+        parts = []
+        for seq, chunk in enumerate(chunks):
+            part = dict(entry, members=chunk, chunk={"upload_id": upload_id, "seq": seq, "total": len(chunks)})
+            if seq and "removed" in part:
+                part["removed"] = []
+            parts.append(json.dumps(part, ensure_ascii=False).encode("utf-8"))
+        return parts
+
+    async def _push_loop(self) -> None:
+        """收集一个时间窗口内的推送分片，按字节上限打包后发送"""
+        loop = asyncio.get_running_loop()
+        while True:
+            items = [await self._push_queue.get()]
+            deadline = loop.time() + self.PUSH_BATCH_WINDOW
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    items.append(await asyncio.wait_for(self._push_queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # 同一请求只能上报一个账号，按负责账号分组打包
+            by_account: Dict[str, List[tuple]] = {}
+            for item in items:
+                by_account.setdefault(item[2], []).append(item)
+            for bot_qq, account_items in by_account.items():
+                batch, batch_bytes = [], 0
+                for item in account_items:
+                    if batch and batch_bytes + len(item[0]) > self.PUSH_BATCH_BYTES:
+                        self._spawn(self._send_push_batch(bot_qq, batch))
+                        batch, batch_bytes = [], 0
+                    batch.append(item)
+                    batch_bytes += len(item[0])
+                self._spawn(self._send_push_batch(bot_qq, batch))
+
+    async def _send_push_batch(self, bot_qq: str, items: List[tuple]) -> None:
+        """发送一个合并推送请求，并把各分片的结果回填给提交方"""
+        body = b"".join([
+            b'{"bot_qq":', json.dumps(bot_qq).encode("utf-8"),
+            b',"groups":[', b",".join(part for part, _, _ in items), b"]}"
+        ])
+        try:
+            async with self._push_semaphore:
+                result = await self._post_push_body(body)
+            results = result.get("results") if isinstance(result, dict) else None
+            if not isinstance(results, list) or len(results) != len(items):
+                results = [result] * len(items)
+            outcomes = [
+                (True, "") if isinstance(r, dict) and r.get("status") == "success"
+                else (False, f"推送失败: {r.get('message', '未知错误') if isinstance(r, dict) else '未知错误'}")
+                for r in results
+            ]
+        except aiohttp.ClientResponseError as e:
+            if e.status in (404, 405, 501):
+                logger.info("合并推送接口不可用，改为逐群推送")
+                self._batch_push_supported = False
+                outcomes = [None] * len(items)
+            else:
+                outcomes = [(False, f"API请求失败: {str(e)}")] * len(items)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            outcomes = [(False, f"API请求失败: {str(e) or type(e).__name__}")] * len(items)
+        except Exception as e:
+            outcomes = [(False, f"处理失败: {str(e)}")] * len(items)
+
+        for (_, future, _), outcome in zip(items, outcomes):
+            if not future.done():
+                future.set_result(outcome)
+
+    async def _post_push_body(self, body: bytes) -> Any:
+        """发送合并推送请求体，服务端支持时使用gzip压缩"""
+        if self.PUSH_GZIP and self._gzip_push_supported:
+            compressed = await asyncio.to_thread(gzip.compress, body, 6)
+            try:
+                return await self._api_request(
+                    "POST", self.PUSH_BATCH_ENDPOINT, data=compressed,
+                    headers={"Content-Type": "application/json", "Content-Encoding": "gzip"}
+                )
+            except aiohttp.ClientResponseError as e:
+                if e.status != 415:
+                    raise
+                logger.info("服务端不支持gzip请求体，改为不压缩推送")
+                self._gzip_push_supported = False
+        return await self._api_request(
+            "POST", self.PUSH_BATCH_ENDPOINT, data=body, headers={"Content-Type": "application/json"}
+        )
+
     async def _push_members_to_api(self, members: List[Dict]) -> str:
         """推送成员数据到API"""
         if not members:
             return "没有可推送的成员数据"
+
+        group_id = members[0]["group_id"]
+        batched = await self._submit_push({"group_id": group_id, "mode": "full", "members": members})
+        if batched is not None:
+            ok, message = batched
+            return f"群 {group_id} 成功推送 {len(members)} 名成员" if ok else message
             
         try:
-            url = f"{self.API_BASE_URL}push_group_members.php"
             payload = {
-                "bot_qq": str(self.context.bot.self_id),
+                "bot_qq": self._bot_qq(group_id),
                 "members": members
             }
             
-            response = self.api_session.post(
-                url,
-                json=payload,
-                timeout=self.API_TIMEOUT
-            )
-            response.raise_for_status()
-            result = response.json()
+            result = await self._api_request("POST", "push_group_members.php", json=payload)
             
             if result.get("status") == "success":
-                group_id = members[0]["group_id"]
                 return f"群 {group_id} 成功推送 {len(members)} 名成员"
             else:
                 return f"推送失败: {result.get('message', '未知错误')}"
                 
-        except requests.exceptions.RequestException as e:
-            return f"API请求失败: {str(e)}"
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            return f"API请求失败: {str(e) or type(e).__name__}"
         except Exception as e:
             return f"处理失败: {str(e)}"
 
+    def _bot_qq(self, group_id: str) -> str:
+        """推送时上报的账号：获取该群成员的账号，未知时为默认账号"""
+        return self._group_owner.get(str(group_id)) or str(self.context.bot.self_id)
+
     def _extract_group_id(self, text: str, event: AiocqhttpMessageEvent) -> Optional[str]:
         """从命令文本中提取群号，优先使用参数，其次使用当前群"""
         match = re.search(r'(\d+)', text)
@@ -489,6 +2741,13 @@ class GroupInformationPlugin(Star):
             
         return None
 
+    def _extract_export_format(self, text: str) -> str:
+        """从命令文本中提取导出格式，未指定时使用默认格式"""
+        match = re.search(r'(csv\.gz|gz|csv|xlsx|zip)', text.lower())
+        if not match:
+            return self.EXPORT_FORMAT
+        return "csv.gz" if match.group(1) == "gz" else match.group(1)
+
     @staticmethod
     def _extract_activation_key(comment: str) -> str:
         """从备注中提取12位卡密"""
@@ -499,22 +2758,219 @@ class GroupInformationPlugin(Star):
         """检查用户是否为管理员"""
         return int(user_id) in self.ADMIN_QQS
 
-    @staticmethod
-    async def _is_bot_in_group(bot, group_id: str) -> bool:
+    async def _is_bot_in_group(self, bot, group_id: str, refresh: bool = False) -> bool:
         """检查机器人是否在指定群聊中"""
         try:
-            groups = await bot.get_group_list(no_cache=True)
+            groups = await self._get_group_list(bot, refresh)
             return any(str(g["group_id"]) == group_id for g in groups)
         except Exception:
             return False
 
+    async def _get_group_list(self, bot, refresh: bool = False) -> List[Dict[str, Any]]:
+        """获取群列表，优先使用缓存"""
+        stats = self._cache_stats["group_list"]
+        groups = None if refresh else self._group_list_cache.get("groups")
+        if groups is not None:
+            stats[0] += 1
+            return groups
+
+        stats[1] += 1
+        self._ensure_sync_scheduler()
+        self._ensure_metrics_worker()
+        self._accounts.discover(bot)
+        accounts = self._accounts.available()
+        # 全部已登记账号都返回了群列表时才是完整列表，此时从成员索引中移除已退出的群
+        complete = len(accounts) >= len(self._accounts)
+        if len(accounts) > 1:
+            groups, complete = await self._get_sharded_group_list(accounts)
+            complete = complete and len(accounts) >= len(self._accounts)
+        else:
+            await self._onebot_limiter.acquire()
+            with self._onebot_timer("get_group_list"):
+                groups = await bot.get_group_list(no_cache=True)
+        if isinstance(groups, list):
+            self._group_list_cache.set("groups", groups, self.GROUP_LIST_CACHE_TTL)
+            self._member_index.update_groups(groups, prune=complete)
+        return groups
+
+    async def _get_sharded_group_list(self, accounts: List[str]) -> tuple[List[Dict[str, Any]], bool]:
+        """合并各账号的群列表，并记录每个群可由哪些账号获取；返回 (群列表, 是否所有账号均获取成功)"""
+        async def fetch(self_id: str) -> Any:
+            account = self._accounts.account(self_id)
+            await account["limiter"].acquire()
+            with self._onebot_timer("get_group_list"):
+                return await account["bot"].get_group_list(self_id=int(self_id), no_cache=True)
+
+        results = await asyncio.gather(*(fetch(self_id) for self_id in accounts), return_exceptions=True)
+        merged: Dict[str, Dict[str, Any]] = {}
+        mapping: Dict[str, List[str]] = {}
+        error = None
+        for self_id, result in zip(accounts, results):
+            if not isinstance(result, list):
+                error = result if isinstance(result, Exception) else ValueError("群列表数据无效")
+                self._accounts.record_failure(self_id)
+                logger.warning(f"账号 {self_id} 获取群列表失败: {error}")
+                continue
+            self._accounts.record_success(self_id)
+            for group in result:
+                group_id = str(group["group_id"])
+                merged.setdefault(group_id, group)
+                mapping.setdefault(group_id, []).append(self_id)
+
+        if not merged and error is not None:
+            raise error
+        self._accounts.update_groups(mapping)
+        return list(merged.values()), error is None
+
+    async def _get_group_members_raw(
+        self, bot, group_id: str, refresh: bool = False, cache: bool = True
+    ) -> List[Dict[str, Any]]:
+        """分页获取群成员原始数据，优先使用缓存；返回数据无效时抛出ValueError
+
+        批量任务与定时同步传入 cache=False，获取结果不写入缓存，避免逐群处理后整批数据仍驻留内存
+        """
+        stats = self._cache_stats["members"]
+        members = None if refresh else self._member_cache.get(group_id)
+        if members is not None:
+            stats[0] += 1
+            return members
+
+        stats[1] += 1
+        candidates = self._accounts.candidates(group_id) if len(self._accounts) > 1 else []
+        if not candidates:
+            members = await self._fetch_member_pages(bot, group_id, self._onebot_limiter)
+        else:
+            # 由负责账号获取，失败时依次切换到同在群内的其他账号
+            for idx, self_id in enumerate(candidates):
+                account = self._accounts.account(self_id)
+                try:
+                    members = await self._fetch_member_pages(account["bot"], group_id, account["limiter"], self_id)
+                except Exception as e:
+                    self._accounts.record_failure(self_id)
+                    if idx == len(candidates) - 1:
+                        raise
+                    logger.warning(f"账号 {self_id} 获取群 {group_id} 成员失败，切换账号: {str(e)}")
+                    continue
+                self._accounts.record_success(self_id)
+                self._group_owner[group_id] = self_id
+                break
+
+        if cache:
+            self._member_cache.set(group_id, members, self.MEMBER_CACHE_TTL)
+        else:
+            self._member_cache.pop(group_id)
+        self._member_index.replace_group(group_id, members)
+        return members
+
+    async def _fetch_member_pages(
+        self, bot, group_id: str, limiter: TokenBucket, self_id: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """通过指定账号分页获取群成员"""
+        members = []
+        next_token = None
+        while True:
+            params = {"group_id": int(group_id), "no_cache": True}
+            if self_id:
+                params["self_id"] = int(self_id)
+            if next_token:
+                params["next_token"] = next_token
+
+            await limiter.acquire()  # 分页请求经限流器控制节奏
+            with self._onebot_timer("get_group_member_list"):
+                result = await bot.get_group_member_list(**params)
+            
+            # 处理分页数据
+            if isinstance(result, dict):
+                members.extend(result.get("data", []))
+                next_token = result.get("next_token")
+            elif isinstance(result, list):
+                members.extend(result)
+                next_token = None
+            elif not members:
+                raise ValueError("成员数据无效")
+            else:
+                break
+
+            if not next_token:
+                break
+
+        return members
+
     async def _mark_key_used(self, group_id: str, key: str, user_id: str) -> None:
-        """标记卡密已使用"""
+        """标记卡密已使用：写入本地队列，由后台任务批量推送至API"""
+        self._key_cache.pop((group_id, key))
         try:
-            url = f"{self.API_BASE_URL}mark_key.php?group_id={group_id}&key={key}&used_by={user_id}"
-            await self.context.loop.run_in_executor(
-                None, 
-                lambda: self.api_session.get(url, timeout=self.API_TIMEOUT)
-            )
+            self._mark_queue.push(group_id, key, user_id)
+            self._ensure_mark_worker()
+            self._mark_wakeup.set()
         except Exception as e:
-            logger.error(f"标记卡密使用状态失败: {str(e)}")
+            logger.error(f"记录卡密使用状态失败: {str(e)}")
+
+    def _ensure_mark_worker(self) -> None:
+        """启动卡密使用记录推送任务"""
+        if self._mark_worker is None or self._mark_worker.done():
+            self._mark_wakeup = asyncio.Event()
+            self._mark_worker = asyncio.create_task(self._mark_flush_loop())
+
+    async def _mark_flush_loop(self) -> None:
+        """批量推送卡密使用记录，失败的记录按指数退避重试"""
+        while True:
+            try:
+                rows = self._mark_queue.due(self.MARK_BATCH_SIZE)
+                if not rows:
+                    wait = self._mark_queue.next_due_in()
+                    self._mark_wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._mark_wakeup.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                results = await self._push_marks(rows)
+                done = [row[0] for row, ok in zip(rows, results) if ok]
+                failed = [row for row, ok in zip(rows, results) if not ok]
+                self._mark_queue.remove(done)
+                if failed:
+                    self._mark_queue.reschedule(failed, [
+                        min(self.MARK_BACKOFF_BASE * (2 ** row[4]), self.MARK_BACKOFF_MAX) for row in failed
+                    ])
+                    logger.warning(f"卡密使用状态推送失败 {len(failed)} 条，稍后重试")
+                if len(rows) < self.MARK_BATCH_SIZE:
+                    # 未满一批时稍作等待，让后续记录合并推送
+                    await asyncio.sleep(self.MARK_FLUSH_INTERVAL)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"卡密使用记录推送任务错误: {str(e)}", exc_info=True)
+                await asyncio.sleep(self.MARK_BACKOFF_BASE)
+
+    async def _push_marks(self, rows: List[tuple]) -> List[bool]:
+        """推送一批卡密使用记录，返回每条记录是否成功"""
+        if self._bulk_mark_supported and len(rows) > 1:
+            payload = {"items": [
+                {"group_id": group_id, "key": key, "used_by": used_by} for _, group_id, key, used_by, _ in rows
+            ]}
+            try:
+                result = await self._api_request("POST", self.MARK_BULK_ENDPOINT, json=payload)
+                if isinstance(result, dict) and result.get("status") == "success":
+                    return [True] * len(rows)
+            except aiohttp.ClientResponseError as e:
+                if e.status not in (404, 405, 501):
+                    return [False] * len(rows)
+                logger.info("批量标记接口不可用，降级为单条标记")
+                self._bulk_mark_supported = False
+            except (aiohttp.ClientError, asyncio.TimeoutError, ValueError):
+                # ValueError：返回200但内容不是JSON（如维护页面），同样按退避重试
+                return [False] * len(rows)
+
+        async def mark_one(group_id: str, key: str, used_by: str) -> bool:
+            try:
+                await self._api_request(
+                    "GET", "mark_key.php", params={"group_id": group_id, "key": key, "used_by": used_by}
+                )
+                return True
+            except Exception as e:
+                logger.error(f"标记卡密使用状态失败: {str(e) or type(e).__name__}")
+                return False
+
+        return list(await asyncio.gather(*(mark_one(g, k, u) for _, g, k, u, _ in rows)))